@@ -86,6 +86,31 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# API rate-limit counters live in the cache. Set REDIS_URL in production so
+# every worker process shares the same counters.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    # Session reads (auth, flashed messages) are served from Redis and
+    # only writes go through to the database
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -123,11 +148,37 @@ MEDIA_URL= 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR , 'media')
 STATIC_URL = 'static/'
 
+# Uploads
+# https://docs.djangoproject.com/en/5.2/ref/settings/#file-upload-max-memory-size
+# Typical image uploads stay in memory and are decoded from there; videos
+# and large audio still spool to disk, where they are linked into place
+# rather than copied.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+# Per-frame video progress is logged at DEBUG; set NLP_LOG_LEVEL=DEBUG to see it.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'nlp_classifier': {
+            'handlers': ['console'],
+            'level': os.environ.get('NLP_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # ========================================
 # REST FRAMEWORK CONFIGURATION
 # ========================================
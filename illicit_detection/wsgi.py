@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'illicit_detection.settings')
 
 application = get_wsgi_application()
+
+# The URLconf (and with it the classifier models) is otherwise imported
+# on the first request. Loading and warming the models here moves that
+# cost to server start; under gunicorn --preload on CPU the weights are
+# then loaded once and shared copy-on-write by the forked workers.
+if os.environ.get('WARM_UP_MODELS', '1') == '1':
+    from nlp_classifier.classifier import warm_up
+
+    warm_up()
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import UserProfile, ContentSubmission, AdminReview, APIKey, Notification, BillingRecord, Payment
 
 # ========================================
@@ -7,6 +8,7 @@ from .models import UserProfile, ContentSubmission, AdminReview, APIKey, Notific
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'role', 'organization', 'created_at']
+    list_select_related = ['user']
     list_filter = ['role', 'created_at']
     search_fields = ['user__username', 'user__email', 'organization']
     readonly_fields = ['created_at', 'updated_at']
@@ -18,6 +20,7 @@ class UserProfileAdmin(admin.ModelAdmin):
 @admin.register(ContentSubmission)
 class ContentSubmissionAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'content_type', 'status', 'flagged', 'is_from_api', 'created_at']
+    list_select_related = ['user', 'api_key']
     list_filter = ['content_type', 'status', 'flagged', 'is_from_api', 'created_at']
     search_fields = ['user__username', 'text_content', 'content_url']
     readonly_fields = ['created_at', 'updated_at']
@@ -40,6 +43,10 @@ class ContentSubmissionAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at')
         }),
     )
+    
+    def get_queryset(self, request):
+        # The change form renders both FKs as well, so join them there too
+        return super().get_queryset(request).select_related('user', 'api_key')
 
 
 # ========================================
@@ -48,6 +55,7 @@ class ContentSubmissionAdmin(admin.ModelAdmin):
 @admin.register(AdminReview)
 class AdminReviewAdmin(admin.ModelAdmin):
     list_display = ['id', 'submission', 'admin', 'decision', 'reviewed_at']
+    list_select_related = ['submission__user', 'admin']
     list_filter = ['decision', 'reviewed_at']
     search_fields = ['admin__username', 'comments', 'submission__id']
     readonly_fields = ['reviewed_at']
@@ -59,9 +67,10 @@ class AdminReviewAdmin(admin.ModelAdmin):
 @admin.register(APIKey)
 class APIKeyAdmin(admin.ModelAdmin):
     list_display = ['user', 'name', 'tier', 'requests_today', 'daily_limit', 'is_active', 'created_at']
+    list_select_related = ['user']
     list_filter = ['tier', 'is_active', 'created_at']
     search_fields = ['user__username', 'name', 'key']
-    readonly_fields = ['key', 'created_at', 'last_used', 'last_reset']
+    readonly_fields = ['key', 'created_at', 'last_used', 'last_reset', 'daily_limit']
     
     fieldsets = (
         ('Basic Information', {
@@ -85,6 +94,7 @@ class APIKeyAdmin(admin.ModelAdmin):
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ['user', 'title', 'notification_type', 'is_read', 'created_at']
+    list_select_related = ['user', 'related_submission']
     list_filter = ['notification_type', 'is_read', 'created_at']
     search_fields = ['user__username', 'title', 'message']
     readonly_fields = ['created_at']
@@ -108,6 +118,7 @@ class NotificationAdmin(admin.ModelAdmin):
 @admin.register(BillingRecord)
 class BillingRecordAdmin(admin.ModelAdmin):
     list_display = ['user', 'year', 'month', 'total_requests', 'free_requests_used', 'paid_requests', 'amount_charged', 'last_updated']
+    list_select_related = ['user', 'api_key']
     list_filter = ['year', 'month', 'last_updated']
     search_fields = ['user__username']
     readonly_fields = ['created_at', 'last_updated']
@@ -130,9 +141,12 @@ class BillingRecordAdmin(admin.ModelAdmin):
     actions = ['recalculate_charges']
     
     def recalculate_charges(self, request, queryset):
-        for record in queryset:
-            record.calculate_charges()
-        self.message_user(request, f"Recalculated charges for {queryset.count()} billing records.")
+        # Single UPDATE computed in the database instead of a save() per record
+        updated = queryset.update(
+            amount_charged=BillingRecord.CHARGE_EXPRESSION,
+            last_updated=timezone.now()
+        )
+        self.message_user(request, f"Recalculated charges for {updated} billing records.")
     recalculate_charges.short_description = "Recalculate charges for selected records"
 
 
@@ -142,13 +156,14 @@ class BillingRecordAdmin(admin.ModelAdmin):
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['user', 'api_key', 'payment_gateway', 'payment_type', 'amount', 'status', 'created_at']
-    list_filter = ['payment_gateway', 'payment_type', 'status', 'created_at']
+    list_select_related = ['user', 'api_key__user']
+    list_filter = ['payment_gateway', 'payment_type', 'tier', 'status', 'created_at']
     search_fields = ['user__username', 'api_key__name', 'stripe_payment_intent_id', 'stripe_charge_id', 'razorpay_order_id', 'razorpay_payment_id']
     readonly_fields = ['created_at', 'stripe_payment_intent_id', 'stripe_charge_id', 'razorpay_order_id', 'razorpay_payment_id', 'razorpay_signature']
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('user', 'api_key', 'payment_type', 'payment_gateway', 'status')
+            'fields': ('user', 'api_key', 'payment_type', 'tier', 'payment_gateway', 'status')
         }),
         ('Payment Details', {
             'fields': ('amount', 'description')
@@ -6,12 +6,11 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.authentication import SessionAuthentication
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from PIL import Image
-import numpy as np
-import tempfile
+from django.db.models import F
+from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache
 import os
-import requests
-from io import BytesIO
 
 from .models import ContentSubmission, APIKey, BillingRecord, Notification
 from .serializers import (
@@ -22,11 +21,57 @@ from .serializers import (
     ContentSubmissionSerializer
 )
 from .classifier import classify_text, classify_image, analyze_video
+from .http_client import fetch_bytes
+from .tasks import run_in_background, deliver_webhook
+from .view_helpers import (
+    decode_image, save_upload_to_tempfile, download_to_tempfile,
+    cached_infer, INFERENCE_CACHE_TTL, URL_INFERENCE_CACHE_TTL,
+)
 
 
 # ========================================
 # CUSTOM API KEY AUTHENTICATION
 # ========================================
+API_KEY_CACHE_TTL = 60  # seconds a looked-up key is served from cache
+RATE_LIMIT_WINDOW = 60 * 60 * 24
+# Cache-kept counts are copied onto the row this often, for the dashboards
+USAGE_SYNC_INTERVAL = 10
+
+# A per-process cache would give every worker its own counter (and reset it
+# on restart), so without a shared cache the database does the counting
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+SHARED_RATE_LIMIT = settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def get_cached_api_key(api_key):
+    """
+    Look up an active API key, caching the row briefly so hot keys skip the
+    SELECT. Tier changes and deletions clear the entry; other edits (e.g.
+    deactivating a key in the admin) take up to API_KEY_CACHE_TTL.
+    """
+    cache_key = APIKey.lookup_cache_key(api_key)
+    key_obj = cache.get(cache_key)
+    if key_obj is None:
+        key_obj = APIKey.objects.select_related('user').get(key=api_key, is_active=True)
+        cache.set(cache_key, key_obj, API_KEY_CACHE_TTL)
+    return key_obj
+
+
+def count_api_request(key_obj, today):
+    """Atomically increment and return today's request count for a key"""
+    counter_key = key_obj.rate_limit_key(today)
+    cache.add(counter_key, 0, RATE_LIMIT_WINDOW)
+    try:
+        return cache.incr(counter_key)
+    except ValueError:
+        # Counter expired between add() and incr()
+        cache.set(counter_key, 1, RATE_LIMIT_WINDOW)
+        return 1
+
+
 def authenticate_api_key(request):
     """Authenticate using API key from header"""
     api_key = request.headers.get('X-API-Key')
@@ -35,32 +80,34 @@ def authenticate_api_key(request):
         return None, {"error": "API key required in X-API-Key header"}
     
     try:
-        key_obj = APIKey.objects.get(key=api_key, is_active=True)
-        
-        if not key_obj.can_make_request():
+        key_obj = get_cached_api_key(api_key)
+    except APIKey.DoesNotExist:
+        return None, {"error": "Invalid API key"}
+    
+    if not SHARED_RATE_LIMIT:
+        if not key_obj.consume_request():
             return None, {"error": "Daily rate limit exceeded"}
-        
-        key_obj.increment_usage()
         return key_obj, None
     
-    except APIKey.DoesNotExist:
-        return None, {"error": "Invalid API key"}
+    today = timezone.localdate()
+    requests_today = count_api_request(key_obj, today)
+    if requests_today > key_obj.daily_limit:
+        return None, {"error": "Daily rate limit exceeded"}
+    
+    # Mirror the usage onto the row for dashboards, but only every few
+    # requests so the hot path does not write to the database each time
+    if requests_today == 1 or requests_today % USAGE_SYNC_INTERVAL == 0:
+        key_obj.record_usage(requests_today, today)
+    return key_obj, None
 
 
 def send_webhook_notification(webhook_url, submission_data):
-    """Send webhook notification when content is flagged"""
+    """Queue a webhook notification when content is flagged"""
     if not webhook_url:
         return
     
-    try:
-        requests.post(
-            webhook_url,
-            json=submission_data,
-            timeout=10,
-            headers={'Content-Type': 'application/json'}
-        )
-    except Exception as e:
-        print(f"Webhook notification failed: {str(e)}")
+    # Delivery can take up to the webhook timeout, so keep it off the request
+    run_in_background(deliver_webhook, webhook_url, submission_data)
 
 
 def track_api_usage(api_key_obj):
@@ -68,13 +115,14 @@ def track_api_usage(api_key_obj):
     Track API usage for billing purposes.
     - First 50 requests per day are free
     - After that, $0.01 per request
-    """
-    from datetime import datetime
     
+    The counters are updated in the database, so the returned record holds
+    the values from before this request was counted.
+    """
     user = api_key_obj.user
-    now = datetime.now()
-    current_month = now.month
-    current_year = now.year
+    today = timezone.localdate()
+    current_month = today.month
+    current_year = today.year
     
     # Get or create billing record for current month
     billing_record, created = BillingRecord.objects.get_or_create(
@@ -90,28 +138,39 @@ def track_api_usage(api_key_obj):
         }
     )
     
-    # Increment total requests
-    billing_record.total_requests += 1
-    
-    # Check if this is a free or paid request
-    if billing_record.free_requests_used < 50:
-        # Still within free tier
-        billing_record.free_requests_used += 1
+    # Increments are applied with F() expressions so concurrent requests
+    # cannot overwrite each other's counts. The conditional filters decide
+    # between the free and paid buckets inside the UPDATE itself.
+    records = BillingRecord.objects.filter(pk=billing_record.pk)
+    
+    # Still within free tier
+    if records.filter(free_requests_used__lt=50).update(
+        total_requests=F('total_requests') + 1,
+        free_requests_used=F('free_requests_used') + 1,
+        last_updated=timezone.now(),
+    ):
+        return billing_record
+    
+    # Exceeds free tier - charge for this request. F() refers to the value
+    # before the update, so the new charge is (paid_requests + 1) * cost.
+    charge = {
+        'total_requests': F('total_requests') + 1,
+        'paid_requests': F('paid_requests') + 1,
+        'amount_charged': F('paid_requests') * F('cost_per_request') + F('cost_per_request'),
+        'last_updated': timezone.now(),
+    }
+    
+    # Only the request that moves paid_requests from 0 to 1 matches this filter
+    if records.filter(paid_requests=0).update(**charge):
+        # Send notification for the first paid request
+        Notification.objects.create(
+            user=user,
+            title="Free Tier Limit Reached",
+            message=f"You have exceeded your 50 free daily requests. Additional requests will be charged at $0.01 per request.",
+            notification_type='billing'
+        )
     else:
-        # Exceeds free tier - charge for this request
-        billing_record.paid_requests += 1
-        billing_record.calculate_charges()
-        
-        # Send notification if first paid request
-        if billing_record.paid_requests == 1:
-            Notification.objects.create(
-                user=user,
-                title="Free Tier Limit Reached",
-                message=f"You have exceeded your 50 free daily requests. Additional requests will be charged at $0.01 per request.",
-                notification_type='billing'
-            )
-    
-    billing_record.save()
+        records.update(**charge)
     
     return billing_record
 
@@ -154,7 +213,9 @@ def api_classify_text(request):
     
     try:
         # Classify text
-        scores, root_words, text_categories, detected_lang, text_conclusion = classify_text(text)
+        scores, root_words, text_categories, detected_lang, text_conclusion = cached_infer(
+            'text', " ".join(text.split()).encode(), lambda: classify_text(text)
+        )
         
         # Save submission
         submission = ContentSubmission.objects.create(
@@ -230,26 +291,37 @@ def api_classify_image(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     webhook_url = serializer.validated_data.get('webhook_url')
-    image_input = None
     file_path = None
     
     try:
         # Load image
+        # Decoding/downloading is deferred so result cache hits skip it
         if 'image_file' in request.FILES:
             image_file = request.FILES['image_file']
-            image_input = Image.open(image_file).convert("RGB")
-            image_input = np.array(image_input)
+            image_bytes = image_file.read()
+            cache_args = ('image', image_bytes)
+            cache_ttl = INFERENCE_CACHE_TTL
+            load_image = lambda: decode_image(image_bytes)
             file_path = f"api_upload_{image_file.name}"
         elif serializer.validated_data.get('image_url'):
             img_url = serializer.validated_data['image_url']
-            resp = requests.get(img_url, timeout=10)
-            resp.raise_for_status()
-            image_input = Image.open(BytesIO(resp.content)).convert("RGB")
-            image_input = np.array(image_input)
+            cache_args = ('image_url', img_url.encode())
+            cache_ttl = URL_INFERENCE_CACHE_TTL
+
+            def load_image():
+                _, body = fetch_bytes(img_url)
+                return decode_image(body)
             file_path = img_url
+        else:
+            return Response(
+                {'error': 'Either image_url or image_file must be provided.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Classify image
-        img_results, image_categories, image_conclusion = classify_image(image_input)
+        img_results, image_categories, image_conclusion = cached_infer(
+            *cache_args, lambda: classify_image(load_image()), timeout=cache_ttl
+        )
         
         # Save submission
         submission = ContentSubmission.objects.create(
@@ -332,18 +404,11 @@ def api_classify_video(request):
         # Load video
         if 'video_file' in request.FILES:
             video_file = request.FILES['video_file']
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_video:
-                for chunk in video_file.chunks():
-                    temp_video.write(chunk)
-                temp_video_path = temp_video.name
+            temp_video_path = save_upload_to_tempfile(video_file, suffix=".mp4")
         elif serializer.validated_data.get('video_url'):
             # Download video from URL
             video_url = serializer.validated_data['video_url']
-            resp = requests.get(video_url, timeout=30)
-            resp.raise_for_status()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_video:
-                temp_video.write(resp.content)
-                temp_video_path = temp_video.name
+            temp_video_path = download_to_tempfile(video_url, suffix=".mp4")
         
         # Analyze video
         analysis_result = analyze_video(temp_video_path, frame_skip=frame_skip)
@@ -412,9 +477,11 @@ def api_get_submission(request, submission_id):
         return Response(error, status=status.HTTP_401_UNAUTHORIZED)
     
     try:
-        submission = ContentSubmission.objects.get(
+        submission = ContentSubmissionSerializer.setup_eager_loading(
+            ContentSubmission.objects
+        ).get(
             id=submission_id,
-            user=api_key_obj.user
+            user_id=api_key_obj.user_id
         )
         serializer = ContentSubmissionSerializer(submission)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -6,25 +6,60 @@ from transformers import ViTForImageClassification, ViTImageProcessor
 import torch
 from keybert import KeyBERT
 from deep_translator import GoogleTranslator
-from langdetect import detect
+import fasttext
 import cv2
 import numpy as np
-import requests
+import nudenet
 from nudenet import NudeDetector
+import onnxruntime
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 import os
 import tempfile
+import logging
+import queue
+import re
+import threading
+
+from .http_client import fetch_bytes, fetch_to_file
+
+logger = logging.getLogger(__name__)
 
 
 
 
+# ========================================
+# DEVICE SELECTION
+# ========================================
+# Run on the GPU in half precision when one is available; FP16 on CPU is
+# slower than FP32, so CPU deployments keep full precision.
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+model_dtype = torch.float16 if device.type == "cuda" else torch.float32
+# ViT inputs are always resized to one shape, so cuDNN's per-shape
+# autotuning is paid once and reused for every image
+torch.backends.cudnn.benchmark = True
+
+# Opt-in int8 weights for CPU deployments (QUANTIZE_MODELS=1): smaller
+# models and faster CPU matmuls, at the cost of a little accuracy
+quantize_cpu_models = device.type == "cpu" and os.environ.get("QUANTIZE_MODELS") == "1"
+
+def quantize_linear_layers(model):
+    # Dynamic quantization: int8 weights, activations quantized per call
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
 # ========================================
 # TEXT MODEL LOADING
 # ========================================
 model_name = "unitary/unbiased-toxic-roberta"
 tokenizer = AutoTokenizer.from_pretrained(model_name)
 text_model = AutoModelForSequenceClassification.from_pretrained(model_name)
+text_model = text_model.to(device=device, dtype=model_dtype).eval()
+if quantize_cpu_models:
+    text_model = quantize_linear_layers(text_model)
+if device.type == "cuda":
+    # Token lengths vary per request, so compile with dynamic shapes
+    text_model = torch.compile(text_model, dynamic=True)
 kw_model = KeyBERT()
 
 # ========================================
@@ -33,8 +68,68 @@ kw_model = KeyBERT()
 # 🔹 Single multi-category illicit content classifier
 new_image_model_name = "karannnn309/vit-finetuned-illicit-classifier-final"  # <--- update if needed
 image_model = ViTForImageClassification.from_pretrained(new_image_model_name)
+image_model = image_model.to(device=device, dtype=model_dtype).eval()
+if quantize_cpu_models:
+    image_model = quantize_linear_layers(image_model)
 image_processor = ViTImageProcessor.from_pretrained(new_image_model_name)
 
+# The processor's resize/rescale/normalize, replayed with cv2 and tensor
+# ops so full-resolution pixels never go through PIL
+vit_input_size = (image_processor.size["height"], image_processor.size["width"])
+vit_mean = torch.tensor(image_processor.image_mean, device=device).view(1, 3, 1, 1)
+vit_std = torch.tensor(image_processor.image_std, device=device).view(1, 3, 1, 1)
+
+# ========================================
+# LANGUAGE IDENTIFICATION
+# ========================================
+# fastText's compressed lid.176 model (~1 MB) identifies the language in
+# native code, far faster than langdetect's pure-Python profiles.
+LID_MODEL_URL = "https://dl.fbaipublicfiles.com/fasttext/supervised-models/lid.176.ftz"
+LID_MODEL_PATH = os.environ.get(
+    "FASTTEXT_LID_MODEL",
+    os.path.join(os.path.expanduser("~"), ".cache", "fasttext", "lid.176.ftz"),
+)
+
+LID_MODEL_MAX_BYTES = 5 * 1024 * 1024
+_lid_model = None
+_lid_model_lock = threading.Lock()
+
+def download_lid_model(path):
+    """Stream the language-ID model to path via a temp file in the same
+    directory, so a failed or concurrent download never leaves a partial file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False) as f:
+        try:
+            fetch_to_file(LID_MODEL_URL, f, max_bytes=LID_MODEL_MAX_BYTES,
+                          timeout=(5, 30), deadline=120)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, path)
+
+def get_lid_model():
+    """Load the language-ID model on first use (warm_up() does it at startup), downloading it once if missing."""
+    global _lid_model
+    if _lid_model is None:
+        # Only one thread downloads and loads; the rest wait for its model
+        with _lid_model_lock:
+            if _lid_model is None:
+                if not os.path.exists(LID_MODEL_PATH):
+                    download_lid_model(LID_MODEL_PATH)
+                _lid_model = fasttext.load_model(LID_MODEL_PATH)
+    return _lid_model
+
+def detect_language(text):
+    # fastText predicts one line at a time. The binding's predict() wrapper
+    # calls np.array(..., copy=False), which numpy 2 rejects, so the native
+    # predictor is called directly: it returns [(probability, label)].
+    predictions = get_lid_model().f.predict(text.replace("\n", " "), 1, 0.0, "strict")
+    if not predictions:
+        return "en"
+    return predictions[0][1].replace("__label__", "")
+
 # ========================================
 # TEXT CLASSIFICATION
 # ========================================
@@ -51,8 +146,10 @@ labels = [
 def format_label(label):
     return label.replace("_", " ").title()
 
+FORMATTED_LABELS = [format_label(label) for label in labels]
+
 def classify_text(text):
-    detected_lang = detect(text)
+    detected_lang = detect_language(text)
 
     if detected_lang != 'en':
         try:
@@ -60,19 +157,19 @@ def classify_text(text):
         except Exception:
             raise ValueError(f"Language '{detected_lang}' not supported or translation failed")
 
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512, padding=True)
+    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512, padding=True).to(device)
     with torch.no_grad():
         logits = text_model(**inputs).logits
-    probs = torch.sigmoid(logits)[0].tolist()
-
-    scores = {format_label(label): round(probs[i] * 100, 2) for i, label in enumerate(labels)}
+    # float64 so the rounded percentages serialise as e.g. 12.35, not 12.350000381
+    probs = (torch.sigmoid(logits.double())[0] * 100).round(decimals=2).cpu().numpy()
+    scores = dict(zip(FORMATTED_LABELS, probs.tolist()))
 
     keywords = kw_model.extract_keywords(
         text, keyphrase_ngram_range=(1, 2), stop_words='english', top_n=5
     )
     root_words = [kw for kw, _ in keywords]
 
-    categories = map_detoxify_to_category(scores, text)
+    categories = map_detoxify_to_category_vec(probs, text)
 
     if categories:
         conclusion = f"⚠️ The text contains illicit content related to: {', '.join(categories)}."
@@ -81,35 +178,86 @@ def classify_text(text):
 
     return scores, root_words, categories, detected_lang, conclusion
 
-def map_detoxify_to_category(scores, text):
-    categories = []
-
-    if scores['Threat'] > 60 or (scores['Toxicity'] > 70 and scores['Severe Toxicity'] > 40):
-        categories.append("Violence")
-
-    terrorism_keywords = ["bomb", "jihad", "terror", "attack", "islamic state"]
-    if scores['Threat'] > 70 and scores['Identity Attack'] > 40:
-        if any(word in text.lower() for word in terrorism_keywords):
-            categories.append("Terrorism")
+# Each rule is one AND-group of "score > threshold" tests; a category is
+# detected when any of its rules passes. Stacked into a matrix (labels a
+# rule does not test get -inf) every rule is checked in one comparison.
+CATEGORY_RULES = [
+    ("Violence", {"Threat": 60}),
+    ("Violence", {"Toxicity": 70, "Severe Toxicity": 40}),
+    ("Terrorism", {"Threat": 70, "Identity Attack": 40}),
+    ("Harassment", {"Insult": 50, "Toxicity": 50, "Threat": 50}),
+    ("Harassment", {"Identity Attack": 50, "Toxicity": 50, "Threat": 50}),
+    ("Profanity", {"Obscene": 30, "Sexual Explicit": 20}),
+    ("Hate Speech", {"Identity Attack": 50, "Toxicity": 60}),
+    ("Cyberbullying", {"Insult": 70, "Toxicity": 50}),
+]
+RULE_CATEGORIES = [category for category, _ in CATEGORY_RULES]
+RULE_THRESHOLDS = np.array([
+    [thresholds.get(label, -np.inf) for label in FORMATTED_LABELS]
+    for _, thresholds in CATEGORY_RULES
+])
 
-    if (scores['Insult'] > 50 or scores['Identity Attack'] > 50) and (scores['Toxicity'] > 50 and scores['Threat'] > 50):
-        categories.append("Harassment")
+TERRORISM_KEYWORDS = ["bomb", "jihad", "terror", "attack", "islamic state"]
+TERRORISM_PATTERN = re.compile("|".join(map(re.escape, TERRORISM_KEYWORDS)), re.IGNORECASE)
 
-    if scores['Obscene'] > 30 and scores['Sexual Explicit'] > 20:
-        categories.append("Profanity")
+def map_detoxify_to_category(scores, text):
+    scores_vec = np.array([scores[label] for label in FORMATTED_LABELS])
+    return map_detoxify_to_category_vec(scores_vec, text)
 
-    if scores['Identity Attack'] > 50 and scores['Toxicity'] > 60:
-        categories.append("Hate Speech")
+def map_detoxify_to_category_vec(scores_vec, text):
+    """Same as map_detoxify_to_category, for scores ordered like FORMATTED_LABELS."""
+    rule_matches = (scores_vec > RULE_THRESHOLDS).all(axis=1)
 
-    if scores['Insult'] > 70 and scores['Toxicity'] > 50:
-        categories.append("Cyberbullying")
+    categories = []
+    for rule_idx in np.flatnonzero(rule_matches):
+        category = RULE_CATEGORIES[rule_idx]
+        if category == "Terrorism" and not TERRORISM_PATTERN.search(text):
+            continue
+        categories.append(category)
 
-    return list(set(categories))
+    # Violence and Harassment have two rule rows each; keep the first hit
+    return list(dict.fromkeys(categories))
 
 # ========================================
 # NUDE IMAGE DETECTION
 # ========================================
+def nudenet_providers():
+    # Keep NudeNet on the same device as the torch models. Letting ONNX
+    # Runtime pick every available provider can also select TensorRT, which
+    # builds engines at startup.
+    if device.type == "cuda" and "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+        return ["CUDAExecutionProvider", "CPUExecutionProvider"]
+    return ["CPUExecutionProvider"]
+
+NUDENET_MODEL_PATH = os.path.join(os.path.dirname(nudenet.__file__), "320n.onnx")
+NUDENET_INT8_MODEL_PATH = os.environ.get(
+    "NUDENET_INT8_MODEL",
+    os.path.join(os.path.expanduser("~"), ".cache", "nudenet", "320n.int8.onnx"),
+)
+
+# Concurrent NudeNet calls allowed on inference_pool (defined below)
+INFERENCE_WORKERS = 4
+
+def nudenet_session():
+    model_path = NUDENET_MODEL_PATH
+    if quantize_cpu_models:
+        # Converted once and reused by later processes
+        if not os.path.exists(NUDENET_INT8_MODEL_PATH):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            os.makedirs(os.path.dirname(NUDENET_INT8_MODEL_PATH), exist_ok=True)
+            quantize_dynamic(NUDENET_MODEL_PATH, NUDENET_INT8_MODEL_PATH, weight_type=QuantType.QUInt8)
+        model_path = NUDENET_INT8_MODEL_PATH
+
+    # Up to INFERENCE_WORKERS NudeNet calls run at once, so each one gets an
+    # equal share of the cores instead of oversubscribing them
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = max(1, (os.cpu_count() or 1) // INFERENCE_WORKERS)
+    return onnxruntime.InferenceSession(model_path, options, providers=nudenet_providers())
+
+# NudeDetector 3.4.2 ignores its providers argument, so its session is
+# replaced with one built with the intended providers and model file
 detector = NudeDetector()
+detector.onnx_session = nudenet_session()
 THRESHOLD = 0.8
 EXPLICIT_CLASSES = {
     "FEMALE_GENITALIA_EXPOSED",
@@ -118,15 +266,18 @@ EXPLICIT_CLASSES = {
     "EXPOSED_BUTTOCKS",
 }
 
+def is_url(image_input):
+    return isinstance(image_input, str) and image_input.startswith(("http://", "https://"))
+
+def fetch_image(url):
+    """Download an image and decode it to a BGR array."""
+    _, body = fetch_bytes(url)
+    return cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+
 def detect_nudity(image_input):
-    if isinstance(image_input, str) and image_input.startswith(("http://", "https://")):
-        resp = requests.get(image_input, stream=True)
-        resp.raise_for_status()
-        arr = np.asarray(bytearray(resp.content), dtype=np.uint8)
-        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-        detections = detector.detect(img)
-    else:
-        detections = detector.detect(image_input)
+    if is_url(image_input):
+        image_input = fetch_image(image_input)
+    detections = detector.detect(image_input)
 
     is_explicit = any(
         det["class"] in EXPLICIT_CLASSES and det["score"] >= THRESHOLD for det in detections
@@ -137,48 +288,58 @@ def detect_nudity(image_input):
 # ========================================
 # IMAGE CLASSIFICATION (UPDATED)
 # ========================================
-def classify_image(image_input):
-    if isinstance(image_input, str) and image_input.startswith(("http://", "https://")):
-        resp = requests.get(image_input, stream=True)
-        resp.raise_for_status()
-        arr = np.asarray(bytearray(resp.content), dtype=np.uint8)
-        img_bgr = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    else:
-        img_bgr = image_input
-
-    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+# NudeNet's ONNX session and the ViT's torch ops both release the GIL, so
+# NudeNet runs on this pool while the ViT runs on the calling thread.
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
 
-    # ----- NudeNet -----
+def nudenet_output(image_input):
     is_nude, nude_detections = detect_nudity(image_input)
     nude_score = 0.0
     if is_nude:
         nude_score = max(det["score"] for det in nude_detections if det["class"] in EXPLICIT_CLASSES)
 
-    nude_output = {
+    return {
         "is_nude": is_nude,
         "detections": nude_detections,
         "score": round(nude_score * 100, 2)
     }
 
-    # ----- Single ViT Illicit Classifier -----
-    inputs = image_processor(images=img_rgb, return_tensors="pt")
+def preprocess_images(images, bgr=False):
+    """Resize and normalize uint8 images (RGB, or BGR if bgr) into a ViT pixel_values batch on the model's device."""
+    # Shrink each image while it is still uint8, so a batch of 4K frames
+    # never becomes a multi-GB float tensor just to be downscaled
+    height, width = vit_input_size
+    resized = np.stack([
+        cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA) for img in images
+    ])
+    if bgr:
+        # Swapping channels after the resize only touches 224px images
+        resized = np.ascontiguousarray(resized[..., ::-1])
+    pixel_values = torch.from_numpy(resized).to(device).permute(0, 3, 1, 2).float() / 255.0
+    return ((pixel_values - vit_mean) / vit_std).to(model_dtype)
+
+def illicit_model_outputs(images, bgr=False):
+    """Run the ViT classifier over a list of RGB (or BGR if bgr) images in a single forward pass."""
+    pixel_values = preprocess_images(images, bgr=bgr)
     with torch.no_grad():
-        outputs = image_model(**inputs)
-    probs = torch.nn.functional.softmax(outputs.logits, dim=-1)[0]
-
-    pred_idx = int(torch.argmax(probs))
-    pred_label = image_model.config.id2label[pred_idx]
-    confidence = float(probs[pred_idx])
-
-    all_probs = {image_model.config.id2label[i]: round(float(p) * 100, 2)
-                 for i, p in enumerate(probs)}
-
-    illicit_output = {
-        "label": pred_label,
-        "score": round(confidence * 100, 2),
-        "all_probs": all_probs
-    }
-
+        outputs = image_model(pixel_values=pixel_values)
+    batch_probs = torch.nn.functional.softmax(outputs.logits.float(), dim=-1).cpu()
+
+    id2label = image_model.config.id2label
+    results = []
+    for probs in batch_probs:
+        pred_idx = int(torch.argmax(probs))
+        confidence = float(probs[pred_idx])
+        all_probs = {id2label[i]: round(float(p) * 100, 2)
+                     for i, p in enumerate(probs)}
+        results.append({
+            "label": id2label[pred_idx],
+            "score": round(confidence * 100, 2),
+            "all_probs": all_probs
+        })
+    return results
+
+def summarize_image(nude_output, illicit_output):
     result = {
         "nudenet": nude_output,
         "illicit_model": illicit_output
@@ -187,55 +348,187 @@ def classify_image(image_input):
     categories = []
     if nude_output["is_nude"]:
         categories.append("Nudity")
-    categories.append(f"Detected Category → {pred_label}")
+    categories.append(f"Detected Category → {illicit_output['label']}")
 
     conclusion = " | ".join(categories)
 
     return result, categories, conclusion
 
+def classify_image(image_input):
+    # Fetch URLs once; NudeNet and the ViT both work off the decoded array.
+    img_bgr = fetch_image(image_input) if is_url(image_input) else image_input
+
+    # ----- NudeNet (in parallel with the ViT) -----
+    nude_future = inference_pool.submit(nudenet_output, img_bgr)
+
+    # ----- Single ViT Illicit Classifier -----
+    illicit_output = illicit_model_outputs([img_bgr], bgr=True)[0]
+
+    return summarize_image(nude_future.result(), illicit_output)
+
 # ========================================
 # VIDEO ANALYSIS
 # ========================================
-def analyze_video(video_path, frame_skip=20):
+VIDEO_BATCH_SIZE = 16
+
+def classify_image_batch(images_bgr):
+    """
+    Classify a batch of BGR images (an NHWC uint8 array or a list of arrays).
+    Returns one (result, categories, conclusion) per image, or None where
+    NudeNet failed on that image.
+    """
+    # NudeNet scores one image per call, so the batch fans out over the pool
+    # while the ViT scores every image in one forward pass
+    nude_futures = [inference_pool.submit(nudenet_output, img) for img in images_bgr]
+    illicit_outputs = illicit_model_outputs(images_bgr, bgr=True)
+
+    results = []
+    for idx, (nude_future, illicit_output) in enumerate(zip(nude_futures, illicit_outputs)):
+        try:
+            results.append(summarize_image(nude_future.result(), illicit_output))
+        except Exception as e:
+            logger.warning("Error on batch image %d: %s", idx, e)
+            results.append(None)
+    return results
+
+# Seeking decodes forward from the previous keyframe, which only beats
+# decoding every frame when the gap is wider than a typical GOP.
+SEEK_MIN_FRAME_SKIP = 30
+
+def sample_frames(cap, frame_skip):
+    """Yield (frame_no, frame_bgr) for every frame_skip-th frame, 1-based."""
+    if frame_skip >= SEEK_MIN_FRAME_SKIP:
+        frame_no = frame_skip
+        while True:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no - 1)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame_no, frame
+            frame_no += frame_skip
+    else:
+        # grab() decodes without the colour conversion and copy of read()
+        frame_no = 0
+        while cap.grab():
+            frame_no += 1
+            if frame_no % frame_skip != 0:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            yield frame_no, frame
+
+def extract_frames_batched(cap, frame_skip, batch_size=VIDEO_BATCH_SIZE):
+    """
+    Yield (frame_nos, frames) for an opened cv2.VideoCapture, where frames is
+    a contiguous (n, H, W, 3) uint8 BGR array of at most batch_size sampled
+    frames. Frames are decoded lazily, one batch at a time.
+    """
+    frames = None
+    frame_nos = []
+    for frame_no, frame in sample_frames(cap, frame_skip):
+        if frames is None:
+            frames = np.empty((batch_size,) + frame.shape, dtype=np.uint8)
+        frames[len(frame_nos)] = frame
+        frame_nos.append(frame_no)
+        if len(frame_nos) == batch_size:
+            yield frame_nos, frames
+            # A fresh buffer, since the caller may still hold the last one
+            frames = None
+            frame_nos = []
+
+    if frame_nos:
+        yield frame_nos, frames[:len(frame_nos)]
+
+def prefetched(iterable, depth=1):
+    """
+    Yield the items of iterable while a background thread produces up to
+    depth items ahead. Exceptions raised by iterable are re-raised here.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    end = object()
+
+    def put(entry):
+        # Gives up once the consumer has gone away, so the thread can exit
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except Exception as e:
+            put((end, e))
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+def analyze_video(video_path, frame_skip=20, progress=None):
+    """
+    Classify sampled frames of a video and summarise the categories seen.
+    progress, if given, is called with (frames_done, frames_total) after
+    every batch, counting only the sampled frames.
+    """
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise ValueError("❌ Could not open the video file.")
 
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Frames frame_skip, 2*frame_skip, ... up to frame_count are analysed
+    sampled_count = max(frame_count, 0) // frame_skip
     frame_results = []
-    all_categories = []
-    frame_no = 0
     processed_frames = 0
 
-    print(f"🔍 Processing {frame_count} frames (skipping every {frame_skip})...")
+    logger.info("Processing %d frames (skipping every %d)", frame_count, frame_skip)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_no += 1
-        if frame_no % frame_skip != 0:
-            continue
-
-        processed_frames += 1
-        print(f"🖼️ Analysing frame {frame_no}/{frame_count}")
+    # OpenCV releases the GIL while decoding, so the next batch is decoded
+    # on another thread while this one is being classified
+    for frame_nos, frames in prefetched(extract_frames_batched(cap, frame_skip)):
+        processed_frames += len(frame_nos)
+        logger.debug("Analysing frames %d-%d/%d", frame_nos[0], frame_nos[-1], frame_count)
 
         try:
-            result, categories, conclusion = classify_image(frame)
+            batch_results = classify_image_batch(frames)
+        except Exception as e:
+            logger.warning("Error on frames %d-%d: %s", frame_nos[0], frame_nos[-1], e)
+            continue
+        finally:
+            if progress is not None:
+                progress(processed_frames, max(sampled_count, processed_frames))
+
+        for frame_no, frame_result in zip(frame_nos, batch_results):
+            if frame_result is None:
+                continue
+            result, categories, conclusion = frame_result
             frame_results.append({
                 "frame_no": frame_no,
                 "categories": categories,
                 "result": result,
                 "conclusion": conclusion
             })
-            all_categories.extend(categories)
-        except Exception as e:
-            print(f"⚠️ Error on frame {frame_no}: {str(e)}")
-            continue
 
     cap.release()
 
-    category_counts = Counter(all_categories)
+    category_counts = Counter(cat for frame in frame_results for cat in frame["categories"])
     dominant_categories = [cat for cat, _ in category_counts.most_common(3)]
 
     video_summary = {
@@ -245,12 +538,25 @@ def analyze_video(video_path, frame_skip=20):
         "processed_frames": processed_frames
     }
 
-    print("✅ Video analysis complete.")
+    logger.info("Video analysis complete: %d frames analysed", processed_frames)
     return {
         "frame_results": frame_results,
         "video_summary": video_summary
     }
 
+# ========================================
+# WARM-UP
+# ========================================
+def warm_up():
+    """Run each model once on a dummy input so the first real request doesn't pay for compilation and autotuning"""
+    blank = np.zeros((vit_input_size[0], vit_input_size[1], 3), dtype=np.uint8)
+    try:
+        classify_text("warm up")
+        illicit_model_outputs([blank])
+        nudenet_output(blank)
+    except Exception as e:
+        logger.warning("Model warm-up failed: %s", e)
+
 # ========================================
 # AUDIO CLASSIFICATION (UNCHANGED)
 # ========================================
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User
-from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from django.db.models.functions import Lower
+from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, SetPasswordMixin
 from .models import UserProfile, AdminReview
 
 # ========================================
@@ -24,6 +25,18 @@ class UserRegistrationForm(UserCreationForm):
         'placeholder': 'Organization (Optional)'
     }))
     
+    # Same fields as UserCreationForm (labels, help text, validation), with
+    # the styling applied once here instead of on every instantiation
+    password1, password2 = SetPasswordMixin.create_password_fields()
+    password1.widget.attrs.update({
+        'class': 'form-control',
+        'placeholder': 'Password'
+    })
+    password2.widget.attrs.update({
+        'class': 'form-control',
+        'placeholder': 'Confirm Password'
+    })
+    
     class Meta:
         model = User
         fields = ['username', 'email', 'first_name', 'last_name', 'password1', 'password2']
@@ -34,16 +47,16 @@ class UserRegistrationForm(UserCreationForm):
             }),
         }
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['password1'].widget.attrs.update({
-            'class': 'form-control',
-            'placeholder': 'Password'
-        })
-        self.fields['password2'].widget.attrs.update({
-            'class': 'form-control',
-            'placeholder': 'Confirm Password'
-        })
+    def clean_email(self):
+        email = self.cleaned_data['email']
+        # LOWER(email) = ... matches the auth_user_email_lower index, and
+        # exists() only probes it instead of loading a user row
+        taken = User.objects.alias(email_lower=Lower('email')).filter(
+            email_lower=email.lower()
+        ).exists()
+        if taken:
+            raise forms.ValidationError("An account with this email address already exists.")
+        return email
 
 
 class UserLoginForm(AuthenticationForm):
@@ -73,6 +86,73 @@ class AdminReviewForm(forms.ModelForm):
         }
 
 
+# ========================================
+# UPLOAD FIELDS
+# ========================================
+# File signatures as (offset, bytes); the first few bytes are enough to turn
+# away uploads that are obviously not media before they reach a decoder
+IMAGE_SIGNATURES = [
+    (0, b'\xff\xd8\xff'),         # JPEG
+    (0, b'\x89PNG\r\n\x1a\n'),    # PNG
+    (0, b'GIF8'),                 # GIF
+    (0, b'RIFF'),                 # WebP
+    (0, b'BM'),                   # BMP
+]
+VIDEO_SIGNATURES = [
+    (4, b'ftyp'),                 # MP4 / MOV / M4V
+    (0, b'\x1a\x45\xdf\xa3'),     # Matroska / WebM
+    (0, b'RIFF'),                 # AVI
+]
+AUDIO_SIGNATURES = [
+    (0, b'ID3'),                  # MP3 with ID3 tag
+    (0, b'\xff\xfb'), (0, b'\xff\xf3'), (0, b'\xff\xf2'),  # bare MP3 frames
+    (0, b'RIFF'),                 # WAV
+    (0, b'OggS'),                 # Ogg
+    (0, b'fLaC'),                 # FLAC
+]
+SIGNATURE_READ_SIZE = 16
+
+
+class BoundedUploadMixin:
+    """Reject uploads over max_mb or without one of the allowed file signatures"""
+    default_error_messages = {
+        'too_large': 'File too large (maximum %(max_mb)s MB).',
+        'bad_signature': 'Unsupported file type.',
+    }
+
+    def __init__(self, *args, max_mb=20, signatures=None, **kwargs):
+        self.max_mb = max_mb
+        self.signatures = signatures
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, data):
+        # Runs before the parent's checks so junk never reaches Pillow
+        if data and hasattr(data, 'size'):
+            if data.size > self.max_mb * 1024 * 1024:
+                raise forms.ValidationError(
+                    self.error_messages['too_large'], code='too_large',
+                    params={'max_mb': self.max_mb}
+                )
+            if self.signatures:
+                data.seek(0)
+                head = data.read(SIGNATURE_READ_SIZE)
+                data.seek(0)
+                if not any(head[offset:offset + len(magic)] == magic
+                           for offset, magic in self.signatures):
+                    raise forms.ValidationError(
+                        self.error_messages['bad_signature'], code='bad_signature'
+                    )
+        return super().to_python(data)
+
+
+class BoundedFileField(BoundedUploadMixin, forms.FileField):
+    pass
+
+
+class BoundedImageField(BoundedUploadMixin, forms.ImageField):
+    pass
+
+
 # ========================================
 # CLASSIFICATION FORMS
 # ========================================
@@ -81,12 +161,26 @@ class TextInputForm(forms.Form):
     url = forms.URLField(required=False)
 
 class ImageInputForm(forms.Form):
-    image = forms.ImageField(required=False)
+    image = BoundedImageField(required=False, max_mb=20, signatures=IMAGE_SIGNATURES)
     image_url = forms.URLField(required=False)
-    video = forms.FileField(required=False)
+    video = BoundedFileField(required=False, max_mb=500, signatures=VIDEO_SIGNATURES)
     video_url= forms.URLField(required=False)
 
 
 class AudioInputForm(forms.Form):
-    audio = forms.FileField(required=False, label="Upload Audio (wav/mp3)")
+    audio = BoundedFileField(required=False, label="Upload Audio (wav/mp3)",
+                             max_mb=50, signatures=AUDIO_SIGNATURES)
+
+
+
+# Unbound forms render identically on every request, so GET views share
+# one instance of each instead of building the fields per request.
+UNBOUND_FORMS = {
+    form_class: form_class()
+    for form_class in (TextInputForm, ImageInputForm, AudioInputForm)
+}
+
 
+def get_unbound(form_class):
+    """Return the shared unbound instance of a classification form"""
+    return UNBOUND_FORMS[form_class]
@@ -0,0 +1,90 @@
+"""
+Shared HTTP sessions for outbound requests: `session` for webhooks and
+`fetch_session` for user-supplied image/video URLs. Reusing pooled
+sessions keeps TCP/TLS connections alive between calls instead of paying
+a fresh handshake for every request.
+"""
+
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds for fetching user-supplied URLs: a host that
+# cannot accept a connection in 3s is not worth waiting longer for.
+FETCH_TIMEOUT = (3, 7)
+# The read timeout only bounds each socket read, so a server trickling
+# bytes could hold a worker indefinitely without an overall deadline.
+FETCH_DEADLINE = 30
+MAX_FETCH_BYTES = 20 * 1024 * 1024  # same as the image upload limit
+
+# Retry covers connection errors and gateway hiccups on idempotent
+# methods only, so webhook POSTs are never delivered twice. urllib3
+# already sets TCP_NODELAY and requests keeps connections alive.
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+)
+
+session = requests.Session()
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+
+# User-supplied URLs are fetched on the request thread, so a host that
+# timed out once is not tried again: with retries, one slow host would
+# hold a worker for several times FETCH_TIMEOUT. Only quick gateway
+# errors are retried.
+_fetch_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, connect=0, read=0, backoff_factor=0.3,
+                      status_forcelist=[502, 503, 504]),
+)
+
+fetch_session = requests.Session()
+fetch_session.mount("http://", _fetch_adapter)
+fetch_session.mount("https://", _fetch_adapter)
+
+
+def _capped_chunks(resp, max_bytes, deadline_seconds):
+    """Yield resp's body in chunks, enforcing the byte cap and overall deadline"""
+    declared = resp.headers.get("Content-Length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise ValueError(f"Response is larger than {max_bytes} bytes")
+
+    deadline = time.monotonic() + deadline_seconds
+    received = 0
+    for chunk in resp.iter_content(64 * 1024):
+        received += len(chunk)
+        if received > max_bytes:
+            raise ValueError(f"Response is larger than {max_bytes} bytes")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Download took longer than {deadline_seconds}s")
+        yield chunk
+
+
+def fetch_bytes(url, max_bytes=MAX_FETCH_BYTES, timeout=FETCH_TIMEOUT, **kwargs):
+    """
+    GET a user-supplied URL and return (response, body). Raises ValueError
+    for bodies over max_bytes and TimeoutError past FETCH_DEADLINE.
+    """
+    with fetch_session.get(url, stream=True, timeout=timeout, **kwargs) as resp:
+        resp.raise_for_status()
+        body = bytearray()
+        for chunk in _capped_chunks(resp, max_bytes, FETCH_DEADLINE):
+            body.extend(chunk)
+        return resp, bytes(body)
+
+
+def fetch_to_file(url, fileobj, max_bytes=MAX_FETCH_BYTES, timeout=FETCH_TIMEOUT,
+                  deadline=FETCH_DEADLINE, **kwargs):
+    """
+    Stream a user-supplied URL into fileobj under the same limits as
+    fetch_bytes, without holding the body in memory.
+    """
+    with fetch_session.get(url, stream=True, timeout=timeout, **kwargs) as resp:
+        resp.raise_for_status()
+        for chunk in _capped_chunks(resp, max_bytes, deadline):
+            fileobj.write(chunk)
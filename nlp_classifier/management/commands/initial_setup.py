@@ -4,65 +4,36 @@ Run this after migrations to set up initial data and configurations
 """
 
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import transaction
 from nlp_classifier.models import UserProfile, APIKey
 
 
+# Demo accounts seeded on first run: (user fields, profile fields)
+DEMO_USERS = [
+    (
+        {
+            'username': 'demouser',
+            'email': 'demo@example.com',
+            'password': 'Demo123456!',
+            'first_name': 'Demo',
+            'last_name': 'User',
+        },
+        {'role': 'user', 'organization': 'Demo Organization'},
+    ),
+]
+
+
 class Command(BaseCommand):
     help = 'Initial setup for the application'
 
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.SUCCESS('Starting initial setup...'))
         
-        # Check if admin user exists
-        try:
-            admin_user = User.objects.get(username='admin')
-            self.stdout.write(self.style.WARNING('Admin user already exists'))
-            
-            # Ensure admin has profile
-            profile, created = UserProfile.objects.get_or_create(
-                user=admin_user,
-                defaults={
-                    'role': 'admin',
-                    'organization': 'System Administration'
-                }
-            )
-            if created:
-                self.stdout.write(self.style.SUCCESS('Created admin profile'))
-            else:
-                # Update role if needed
-                if profile.role != 'admin':
-                    profile.role = 'admin'
-                    profile.save()
-                    self.stdout.write(self.style.SUCCESS('Updated admin profile role'))
-                else:
-                    self.stdout.write(self.style.WARNING('Admin profile already exists'))
-                    
-        except User.DoesNotExist:
-            self.stdout.write(self.style.ERROR(
-                'Admin user not found. Please run: python manage.py createsuperuser'
-            ))
-        
-        # Create demo user (optional)
-        demo_username = 'demouser'
-        if not User.objects.filter(username=demo_username).exists():
-            demo_user = User.objects.create_user(
-                username=demo_username,
-                email='demo@example.com',
-                password='Demo123456!',
-                first_name='Demo',
-                last_name='User'
-            )
-            UserProfile.objects.create(
-                user=demo_user,
-                role='user',
-                organization='Demo Organization'
-            )
-            self.stdout.write(self.style.SUCCESS(
-                f'Created demo user: {demo_username} / Demo123456!'
-            ))
-        else:
-            self.stdout.write(self.style.WARNING('Demo user already exists'))
+        with transaction.atomic():
+            self.setup_admin_profile()
+            self.create_demo_users()
         
         self.stdout.write(self.style.SUCCESS('\n✅ Initial setup complete!'))
         self.stdout.write('\nNext steps:')
@@ -70,3 +41,55 @@ class Command(BaseCommand):
         self.stdout.write('2. Visit: http://127.0.0.1:8000/')
         self.stdout.write('3. Login as admin or demouser')
         self.stdout.write('4. Create API keys in Django admin')
+
+    def setup_admin_profile(self):
+        admin_user = User.objects.filter(username='admin').first()
+        if admin_user is None:
+            self.stdout.write(self.style.ERROR(
+                'Admin user not found. Please run: python manage.py createsuperuser'
+            ))
+            return
+
+        self.stdout.write(self.style.WARNING('Admin user already exists'))
+        _, created = UserProfile.objects.update_or_create(
+            user=admin_user,
+            defaults={
+                'role': 'admin',
+                'organization': 'System Administration'
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS('Created admin profile'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Admin profile up to date'))
+
+    def create_demo_users(self):
+        wanted = {user_fields['username'] for user_fields, _ in DEMO_USERS}
+        existing = set(User.objects.filter(username__in=wanted).values_list('username', flat=True))
+        for username in sorted(existing):
+            self.stdout.write(self.style.WARNING(f'Demo user already exists: {username}'))
+
+        specs = [spec for spec in DEMO_USERS if spec[0]['username'] not in existing]
+        if not specs:
+            return
+
+        new_users = []
+        for user_fields, _ in specs:
+            fields = dict(user_fields)
+            fields['password'] = make_password(fields['password'])
+            new_users.append(User(**fields))
+        User.objects.bulk_create(new_users, batch_size=500)
+
+        # Re-read the ids: not every backend returns them from bulk_create
+        user_ids = dict(User.objects.filter(
+            username__in=[u.username for u in new_users]
+        ).values_list('username', 'id'))
+        UserProfile.objects.bulk_create([
+            UserProfile(user_id=user_ids[user_fields['username']], **profile_fields)
+            for user_fields, profile_fields in specs
+        ], batch_size=500)
+
+        for user_fields, _ in specs:
+            self.stdout.write(self.style.SUCCESS(
+                f"Created demo user: {user_fields['username']} / {user_fields['password']}"
+            ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-15 07:12
+
+import nlp_classifier.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nlp_classifier', '0004_payment_payment_gateway_payment_razorpay_order_id_and_more'),
+    ]
+
+    operations = [
+        # A column cannot be altered into a generated column, so drop and
+        # re-add it; the values are derived from tier either way.
+        migrations.RemoveField(
+            model_name='apikey',
+            name='daily_limit',
+        ),
+        migrations.AddField(
+            model_name='apikey',
+            name='daily_limit',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(then=models.Value(50), tier='free'), models.When(then=models.Value(1000), tier='basic'), models.When(then=models.Value(10000), tier='premium'), default=models.Value(50)), output_field=models.IntegerField()),
+        ),
+        migrations.AlterField(
+            model_name='apikey',
+            name='key',
+            field=models.CharField(default=nlp_classifier.models.generate_api_key, editable=False, max_length=64, unique=True),
+        ),
+    ]
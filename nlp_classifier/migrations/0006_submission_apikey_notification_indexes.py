@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-15 07:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nlp_classifier', '0005_apikey_generated_daily_limit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apikey',
+            index=models.Index(fields=['user', 'is_active'], name='apikey_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contentsubmission',
+            index=models.Index(fields=['user', '-created_at'], name='submission_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contentsubmission',
+            index=models.Index(fields=['status', '-created_at'], name='submission_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contentsubmission',
+            index=models.Index(condition=models.Q(('flagged', True)), fields=['-created_at'], name='submission_flagged_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_read_idx'),
+        ),
+    ]
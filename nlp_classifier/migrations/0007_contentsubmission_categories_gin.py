@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-15 07:20
+
+from django.db import migrations
+
+
+def create_gin_index(apps, schema_editor):
+    # jsonb and GIN are PostgreSQL features; other backends keep a plain
+    # table scan, which is fine for development databases.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS submission_categories_gin '
+        'ON nlp_classifier_contentsubmission '
+        'USING GIN (detected_categories jsonb_path_ops)'
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS submission_categories_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nlp_classifier', '0006_submission_apikey_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-15 07:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('nlp_classifier', '0007_contentsubmission_categories_gin'),
+    ]
+
+    operations = [
+        # auth_user belongs to django.contrib.auth, so the expression index
+        # used by the registration email check is created in raw SQL.
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS auth_user_email_lower ON auth_user (LOWER(email))',
+            reverse_sql='DROP INDEX IF EXISTS auth_user_email_lower',
+        ),
+    ]
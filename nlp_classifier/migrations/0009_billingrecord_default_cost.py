@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-15 07:17
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nlp_classifier', '0008_auth_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='billingrecord',
+            name='cost_per_request',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.01'), max_digits=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-15 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nlp_classifier', '0009_billingrecord_default_cost'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contentsubmission',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('failed', 'Analysis Failed'), ('pending_review', 'Pending Review'), ('approved', 'Approved - Clean Content'), ('rejected', 'Rejected - Illicit Content'), ('auto_approved', 'Auto Approved')], default='auto_approved', max_length=20),
+        ),
+    ]
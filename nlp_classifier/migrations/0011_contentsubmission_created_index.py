@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-15 07:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nlp_classifier', '0010_contentsubmission_processing_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contentsubmission',
+            index=models.Index(fields=['-created_at', '-id'], name='submission_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-15 07:34
+
+from django.db import migrations, models
+
+
+def copy_tier_from_description(apps, schema_editor):
+    # Upgrade payments used to carry their tier as a "|<tier>" suffix on
+    # the description; move it into the column and drop the suffix.
+    Payment = apps.get_model('nlp_classifier', 'Payment')
+    payments = list(Payment.objects.filter(description__contains='|').only('id', 'description'))
+    for payment in payments:
+        payment.description, payment.tier = payment.description.rsplit('|', 1)
+    Payment.objects.bulk_update(payments, ['description', 'tier'], batch_size=500)
+
+
+def copy_tier_to_description(apps, schema_editor):
+    Payment = apps.get_model('nlp_classifier', 'Payment')
+    payments = list(Payment.objects.filter(tier__isnull=False).only('id', 'description', 'tier'))
+    for payment in payments:
+        payment.description = f'{payment.description or ""}|{payment.tier}'
+    Payment.objects.bulk_update(payments, ['description'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nlp_classifier', '0011_contentsubmission_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='tier',
+            field=models.CharField(blank=True, choices=[('free', 'Free Tier - 50/day - $0'), ('basic', 'Basic Tier - 1000/day - $9.99/month'), ('premium', 'Premium Tier - 10000/day - $49.99/month')], max_length=20, null=True),
+        ),
+        migrations.RunPython(copy_tier_from_description, copy_tier_to_description),
+    ]
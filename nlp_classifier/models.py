@@ -1,12 +1,90 @@
 from django.db import models
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
-import secrets
+import base64
+import hashlib
+import copy
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+import os
+import threading
+from typing import NamedTuple
+
+# ========================================
+# DIRTY FIELD TRACKING
+# ========================================
+class DirtyFieldsMixin:
+    """Save only the fields that changed since the instance was loaded"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot(field_names)
+        return instance
+
+    def _snapshot(self, attnames=None):
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if attnames is not None and field.attname not in attnames:
+                continue
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                # JSON values can be mutated in place, so keep a private copy
+                loaded[field.attname] = copy.deepcopy(value) if isinstance(field, models.JSONField) else value
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        loaded = self._loaded_values
+        # A field deferred by only()/defer() has no snapshot; if it has been
+        # assigned since, it must be written
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.generated
+            and field.attname in self.__dict__
+            and (field.attname not in loaded
+                 or self.__dict__[field.attname] != loaded[field.attname])
+        ]
+
+    def save(self, *args, **kwargs):
+        if (not args and not self._state.adding and hasattr(self, '_loaded_values')
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert')):
+            dirty = self.get_dirty_fields()
+            # With nothing changed, fall back to a normal save: update_fields=[]
+            # would skip the write, the save signals and auto_now entirely
+            if dirty:
+                # auto_now columns still advance whenever something is written
+                dirty += [
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False) and field.name not in dirty
+                ]
+                kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        self._snapshot(self._attnames(kwargs.get('update_fields')))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot(self._attnames(fields))
+
+    def _attnames(self, names):
+        # Limit a re-snapshot to the fields just written or reloaded, so other
+        # unsaved edits stay dirty
+        if names is None:
+            return None
+        names = set(names)
+        return {
+            field.attname for field in self._meta.concrete_fields
+            if field.name in names or field.attname in names
+        }
+
 
 # ========================================
 # USER PROFILE MODEL
 # ========================================
-class UserProfile(models.Model):
+class UserProfile(DirtyFieldsMixin, models.Model):
     ROLE_CHOICES = [
         ('user', 'Regular User'),
         ('admin', 'Administrator'),
@@ -31,7 +109,7 @@ class UserProfile(models.Model):
 # ========================================
 # CONTENT SUBMISSION MODEL
 # ========================================
-class ContentSubmission(models.Model):
+class ContentSubmission(DirtyFieldsMixin, models.Model):
     CONTENT_TYPE_CHOICES = [
         ('text', 'Text'),
         ('image', 'Image'),
@@ -40,6 +118,8 @@ class ContentSubmission(models.Model):
     ]
     
     STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('failed', 'Analysis Failed'),
         ('pending_review', 'Pending Review'),
         ('approved', 'Approved - Clean Content'),
         ('rejected', 'Rejected - Illicit Content'),
@@ -76,12 +156,22 @@ class ContentSubmission(models.Model):
         verbose_name = 'Content Submission'
         verbose_name_plural = 'Content Submissions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='submission_user_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='submission_status_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='submission_created_idx'),
+            models.Index(
+                fields=['-created_at'],
+                condition=Q(flagged=True),
+                name='submission_flagged_idx'
+            ),
+        ]
 
 
 # ========================================
 # ADMIN REVIEW MODEL
 # ========================================
-class AdminReview(models.Model):
+class AdminReview(DirtyFieldsMixin, models.Model):
     DECISION_CHOICES = [
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
@@ -97,24 +187,28 @@ class AdminReview(models.Model):
         return f"Review by {self.admin.username} - {self.decision}"
     
     def save(self, *args, **kwargs):
-        # Update the submission status when review is saved
-        if self.decision == 'approved':
-            self.submission.status = 'approved'
-        else:
-            self.submission.status = 'rejected'
-        self.submission.save()
+        # Update the submission status when review is saved; a single
+        # UPDATE avoids a full-row save of the submission
+        status = 'approved' if self.decision == 'approved' else 'rejected'
+        ContentSubmission.objects.filter(pk=self.submission_id).update(
+            status=status,
+            updated_at=timezone.now()
+        )
+        if self._meta.get_field('submission').is_cached(self):
+            self.submission.status = status
+            self.submission._snapshot({'status'})
         
         # Create notification for the user
         is_new = self.pk is None
         super().save(*args, **kwargs)
         
-        if is_new and self.submission.user:
+        if is_new and self.submission.user_id:
             Notification.objects.create(
-                user=self.submission.user,
+                user_id=self.submission.user_id,
                 title=f"Content Review: {self.decision.title()}",
                 message=f"Your {self.submission.content_type} submission has been {self.decision}. {self.comments or ''}",
                 notification_type='review_complete',
-                related_submission=self.submission
+                related_submission_id=self.submission_id
             )
     
     class Meta:
@@ -126,32 +220,75 @@ class AdminReview(models.Model):
 # ========================================
 # API KEY MODEL
 # ========================================
-class APIKey(models.Model):
-    TIER_CHOICES = [
-        ('free', 'Free Tier - 50/day - $0'),
-        ('basic', 'Basic Tier - 1000/day - $9.99/month'),
-        ('premium', 'Premium Tier - 10000/day - $49.99/month'),
-    ]
-    
-    TIER_PRICES = {
-        'free': 0.00,
-        'basic': 9.99,
-        'premium': 49.99,
-    }
-    
-    TIER_LIMITS = {
-        'free': 50,
-        'basic': 1000,
-        'premium': 10000,
-    }
+class _KeyPool:
+    """Hands out API key bytes from one os.urandom() draw per KEYS_PER_DRAW keys"""
+    KEY_BYTES = 48  # 64 url-safe characters, same as secrets.token_urlsafe(48)
+    KEYS_PER_DRAW = 256
+
+    buf = bytearray()
+    lock = threading.Lock()
+
+    @classmethod
+    def next_key(cls):
+        with cls.lock:
+            if len(cls.buf) < cls.KEY_BYTES:
+                cls.buf += os.urandom(cls.KEY_BYTES * cls.KEYS_PER_DRAW)
+            raw = bytes(cls.buf[:cls.KEY_BYTES])
+            del cls.buf[:cls.KEY_BYTES]
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+    @classmethod
+    def reset(cls):
+        cls.buf = bytearray()
+        cls.lock = threading.Lock()
+
+
+# A forked worker must never hand out bytes its parent (or a sibling) also holds
+os.register_at_fork(after_in_child=_KeyPool.reset)
+
+
+def generate_api_key():
+    return _KeyPool.next_key()
+
+
+class Tier(NamedTuple):
+    name: str
+    label: str
+    daily_limit: int
+    monthly_price: float
+
+
+class APIKey(DirtyFieldsMixin, models.Model):
+    # The one table of tiers; the choices, prices and limits below are
+    # views of it, so they cannot disagree with each other
+    TIERS = (
+        Tier('free', 'Free Tier - 50/day - $0', 50, 0.00),
+        Tier('basic', 'Basic Tier - 1000/day - $9.99/month', 1000, 9.99),
+        Tier('premium', 'Premium Tier - 10000/day - $49.99/month', 10000, 49.99),
+    )
+    
+    TIER_CHOICES = [(tier.name, tier.label) for tier in TIERS]
+    TIER_PRICES = {tier.name: tier.monthly_price for tier in TIERS}
+    # Tiers a key can be upgraded to, derived so it can't disagree with the prices
+    PAID_TIERS = frozenset(tier for tier, price in TIER_PRICES.items() if price > 0)
+    TIER_LIMITS = {tier.name: tier.daily_limit for tier in TIERS}
+    SUBSCRIPTION_DAYS = 30
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
-    key = models.CharField(max_length=64, unique=True, editable=False)
+    key = models.CharField(max_length=64, unique=True, editable=False, default=generate_api_key)
     name = models.CharField(max_length=100, help_text="Name to identify this API key")
     tier = models.CharField(max_length=20, choices=TIER_CHOICES, default='free')
     
     # Rate limiting
-    daily_limit = models.IntegerField(default=50)
+    # Derived from the tier by the database, so it can never drift from it
+    daily_limit = models.GeneratedField(
+        expression=Case(
+            *[When(tier=tier, then=Value(limit)) for tier, limit in TIER_LIMITS.items()],
+            default=Value(50),
+        ),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
     requests_today = models.IntegerField(default=0)
     last_reset = models.DateField(auto_now_add=True)
     
@@ -170,36 +307,79 @@ class APIKey(models.Model):
     # Webhook configuration
     webhook_url = models.URLField(blank=True, null=True, help_text="URL to notify when content is flagged")
     
-    def save(self, *args, **kwargs):
-        if not self.key:
-            self.key = secrets.token_urlsafe(48)
-        # Update daily limit based on tier
-        if self.tier in self.TIER_LIMITS:
-            self.daily_limit = self.TIER_LIMITS[self.tier]
-        super().save(*args, **kwargs)
+    @staticmethod
+    def lookup_cache_key(raw_key):
+        """Cache key the API authentication stores a looked-up key under"""
+        return f"apikey:{hashlib.sha256(raw_key.encode()).hexdigest()}"
+    
+    def rate_limit_key(self, day):
+        """Cache key of the authoritative per-day request counter"""
+        return f"ratelimit:{self.pk}:{day:%Y%m%d}"
     
     def get_tier_price(self):
         """Get the monthly price for current tier"""
         return self.TIER_PRICES.get(self.tier, 0.00)
     
-    def increment_usage(self):
-        """Increment the usage counter and reset if it's a new day"""
-        from datetime import date
-        today = date.today()
-        if self.last_reset != today:
-            self.requests_today = 0
-            self.last_reset = today
-        self.requests_today += 1
-        self.last_used = timezone.now()
-        self.save()
+    def consume_request(self):
+        """
+        Count one API request against today's limit in the database.
+        Returns False, counting nothing, if the limit is already reached.
+        """
+        # Check and increment are one conditional UPDATE, so concurrent
+        # requests in any number of processes cannot exceed the limit
+        today = timezone.localdate()
+        return bool(APIKey.objects.filter(
+            Q(last_reset__lt=today) | Q(requests_today__lt=F('daily_limit')), pk=self.pk
+        ).update(
+            requests_today=Case(
+                When(last_reset__lt=today, then=Value(1)),
+                default=F('requests_today') + 1,
+            ),
+            last_reset=today,
+            last_used=timezone.now()
+        ))
+    
+    def record_usage(self, requests_today, day):
+        """Mirror a request count kept elsewhere (the shared cache) onto the row"""
+        APIKey.objects.filter(pk=self.pk).update(
+            requests_today=requests_today,
+            last_reset=day,
+            last_used=timezone.now()
+        )
+    
+    def clear_cached_lookup(self, *extra_keys):
+        """Drop the cached row API authentication uses, once the current transaction commits"""
+        stale_keys = [self.lookup_cache_key(self.key), *extra_keys]
+        # Deferred to commit so a rolled-back change clears nothing
+        transaction.on_commit(lambda: cache.delete_many(stale_keys))
+    
+    def activate_subscription(self, tier):
+        """Move the key to a paid tier for one billing period and reset today's usage"""
+        # A single UPDATE; daily_limit follows the tier as a generated column
+        now = timezone.now()
+        APIKey.objects.filter(pk=self.pk).update(
+            tier=tier,
+            subscription_status='active',
+            subscription_start=now,
+            subscription_end=now + timedelta(days=self.SUBSCRIPTION_DAYS),
+            requests_today=0
+        )
+        # With a shared cache the API counts in the cache, not in
+        # requests_today, so reset that counter too and drop the cached row
+        # with the old limit
+        self.clear_cached_lookup(self.rate_limit_key(timezone.localdate()))
     
     def can_make_request(self):
         """Check if the API key can make another request"""
-        from datetime import date
-        today = date.today()
-        if self.last_reset != today:
+        # Read the live counters; this instance may predate other requests
+        usage = APIKey.objects.filter(pk=self.pk).values(
+            'requests_today', 'daily_limit', 'last_reset'
+        ).first()
+        if usage is None:
+            return False
+        if usage['last_reset'] != timezone.localdate():
             return True
-        return self.requests_today < self.daily_limit
+        return usage['requests_today'] < usage['daily_limit']
     
     def __str__(self):
         return f"{self.user.username} - {self.name} ({self.tier})"
@@ -208,6 +388,10 @@ class APIKey(models.Model):
         verbose_name = 'API Key'
         verbose_name_plural = 'API Keys'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_active'], name='apikey_user_active_idx'),
+            models.Index(fields=['user', '-created_at'], name='apikey_user_created_idx'),
+        ]
 
 
 # ========================================
@@ -230,19 +414,36 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Rows per INSERT; Django lowers it further where the backend caps bound
+    # parameters (SQLite)
+    BULK_BATCH_SIZE = 500
+    
     def __str__(self):
         return f"{self.user.username} - {self.title}"
     
+    @classmethod
+    def bulk_notify(cls, rows):
+        """Create notifications from a list of field dicts with batched INSERTs"""
+        return cls.objects.bulk_create(
+            [cls(**row) for row in rows],
+            batch_size=cls.BULK_BATCH_SIZE
+        )
+    
     class Meta:
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_read_idx'),
+        ]
 
 
 # ========================================
 # BILLING RECORD MODEL
 # ========================================
 class BillingRecord(models.Model):
+    DEFAULT_COST_PER_REQUEST = Decimal('0.01')
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='billing_records')
     api_key = models.ForeignKey(APIKey, on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -257,19 +458,46 @@ class BillingRecord(models.Model):
     
     # Financial
     amount_charged = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
-    cost_per_request = models.DecimalField(max_digits=10, decimal_places=4, default=0.01)  # $0.01 per request
+    cost_per_request = models.DecimalField(max_digits=10, decimal_places=4, default=DEFAULT_COST_PER_REQUEST)
     
     # Metadata
     last_updated = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Computed by the database so concurrent usage updates are never overwritten
+    CHARGE_EXPRESSION = F('paid_requests') * F('cost_per_request')
+    
     def calculate_charges(self):
         """Calculate charges based on usage"""
-        if self.paid_requests > 0:
-            self.amount_charged = self.paid_requests * self.cost_per_request
-        else:
-            self.amount_charged = 0.00
-        self.save()
+        BillingRecord.objects.filter(pk=self.pk).update(
+            amount_charged=self.CHARGE_EXPRESSION,
+            last_updated=timezone.now()
+        )
+        self.refresh_from_db(fields=['amount_charged', 'last_updated'])
+    
+    @classmethod
+    def finalize_month(cls, year, month):
+        """Calculate charges for every record of a billing month in one query"""
+        return cls.objects.filter(year=year, month=month).update(
+            amount_charged=cls.CHARGE_EXPRESSION,
+            last_updated=timezone.now()
+        )
+    
+    @classmethod
+    def monthly_revenue(cls, year, month):
+        """Revenue and request totals for a billing month, in one aggregate query"""
+        totals = cls.objects.filter(year=year, month=month).aggregate(
+            total_revenue=Coalesce(
+                Sum(cls.CHARGE_EXPRESSION, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            total_requests=Coalesce(Sum('total_requests'), 0),
+            total_paid_requests=Coalesce(Sum('paid_requests'), 0),
+        )
+        # SQLite hands back the unrounded product sum
+        totals['total_revenue'] = Decimal(totals['total_revenue']).quantize(Decimal('0.01'))
+        return totals
     
     def __str__(self):
         return f"{self.user.username} - {self.year}/{self.month:02d} - ${self.amount_charged}"
@@ -310,6 +538,7 @@ class Payment(models.Model):
     # Payment details
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_type = models.CharField(max_length=20, choices=PAYMENT_TYPE_CHOICES)
+    tier = models.CharField(max_length=20, choices=APIKey.TIER_CHOICES, blank=True, null=True)
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
     payment_gateway = models.CharField(max_length=20, choices=PAYMENT_GATEWAY_CHOICES, default='test')
     
@@ -329,6 +558,30 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
+    @property
+    def amount_minor_units(self):
+        """The amount in cents (Stripe) or paise (Razorpay), as the gateways expect"""
+        # Decimal arithmetic: no float rounding on money
+        return int((Decimal(self.amount) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    
+    def mark_completed(self, **fields):
+        """
+        Mark the payment completed, along with any gateway fields, unless it
+        already is. Returns False if another request completed it first.
+        """
+        # The status check and the write are one conditional UPDATE, so of
+        # two concurrent requests exactly one sees a row updated
+        now = timezone.now()
+        claimed = Payment.objects.filter(pk=self.pk).exclude(status='completed').update(
+            status='completed', completed_at=now, **fields
+        )
+        if claimed:
+            self.status = 'completed'
+            self.completed_at = now
+            for name, value in fields.items():
+                setattr(self, name, value)
+        return bool(claimed)
+    
     def __str__(self):
         return f"{self.user.username} - ${self.amount} - {self.status}"
     
@@ -336,4 +589,10 @@ class Payment(models.Model):
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='payment_user_created_idx'),
+            models.Index(fields=['user', 'status'], name='payment_user_status_idx'),
+            # Razorpay callbacks look the payment up by its order id
+            models.Index(fields=['razorpay_order_id'], name='payment_razorpay_order_idx'),
+        ]
 
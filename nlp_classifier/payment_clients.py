@@ -0,0 +1,21 @@
+"""
+Shared payment gateway clients, built once per process from settings.
+Views use these instead of constructing a client (or assigning the stripe
+module's global api_key) on every request.
+"""
+
+import functools
+
+import razorpay
+import stripe
+from django.conf import settings
+
+
+@functools.lru_cache(maxsize=1)
+def get_stripe_client():
+    return stripe.StripeClient(settings.STRIPE_SECRET_KEY)
+
+
+@functools.lru_cache(maxsize=1)
+def get_razorpay_client():
+    return razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
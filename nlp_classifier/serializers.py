@@ -63,6 +63,11 @@ class ContentSubmissionSerializer(serializers.ModelSerializer):
             'is_from_api', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the related rows this serializer renders"""
+        return queryset.select_related('user')
 
 
 class AdminReviewSerializer(serializers.ModelSerializer):
@@ -73,6 +78,11 @@ class AdminReviewSerializer(serializers.ModelSerializer):
         model = AdminReview
         fields = ['id', 'submission', 'admin', 'decision', 'comments', 'reviewed_at']
         read_only_fields = ['id', 'admin', 'reviewed_at']
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the related rows this serializer renders"""
+        return queryset.select_related('admin', 'submission__user')
 
 
 class APIKeySerializer(serializers.ModelSerializer):
@@ -89,3 +99,8 @@ class APIKeySerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'key': {'write_only': False}  # Show in responses but can't be edited
         }
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the related rows this serializer renders"""
+        return queryset.select_related('user')
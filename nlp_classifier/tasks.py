@@ -0,0 +1,171 @@
+"""
+Background work that should not hold up the request/response cycle.
+Jobs run on small in-process thread pools, so they are best-effort and do
+not survive a worker restart; anything that must happen (payment updates,
+billing notifications) stays in the request's transaction instead. Quick
+jobs (webhooks) and heavy analysis get separate pools, so a few long
+videos cannot hold up everything else.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .classifier import analyze_video
+from .http_client import session
+from .models import ContentSubmission
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='nlp-background')
+ANALYSIS_WORKERS = 2
+# Analysis jobs allowed to wait for a worker; beyond that new ones are refused
+# rather than piling up temp files behind hours of queued video
+MAX_QUEUED_ANALYSES = 4
+_analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='nlp-analysis')
+_pending_analyses = 0
+_pending_lock = threading.Lock()
+
+
+class AnalysisQueueFull(Exception):
+    """Raised when the analysis pool already has as much work as it will take"""
+
+
+def _closing_connections(func, *args, **kwargs):
+    def _run():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Pool threads outlive requests, so drop their DB connections
+            close_old_connections()
+    return _run
+
+
+def run_in_background(func, *args, **kwargs):
+    """Schedule a quick job (webhook delivery) and return its Future"""
+    return _executor.submit(_closing_connections(func, *args, **kwargs))
+
+
+def analysis_queue_full():
+    return _pending_analyses >= ANALYSIS_WORKERS + MAX_QUEUED_ANALYSES
+
+
+def run_analysis(func, *args, **kwargs):
+    """Schedule a slow model job on the analysis pool and return its Future.
+    Raises AnalysisQueueFull instead of queueing without limit."""
+    global _pending_analyses
+    with _pending_lock:
+        if analysis_queue_full():
+            raise AnalysisQueueFull()
+        _pending_analyses += 1
+
+    job = _closing_connections(func, *args, **kwargs)
+
+    def _run():
+        global _pending_analyses
+        try:
+            return job()
+        finally:
+            with _pending_lock:
+                _pending_analyses -= 1
+    return _analysis_executor.submit(_run)
+
+
+# ========================================
+# WEBHOOKS
+# ========================================
+def deliver_webhook(webhook_url, payload):
+    """POST a JSON payload to a client webhook"""
+    try:
+        session.post(
+            webhook_url,
+            data=json.dumps(payload, cls=DjangoJSONEncoder),
+            timeout=10,
+            headers={'Content-Type': 'application/json'}
+        )
+    except Exception as e:
+        logger.warning("Webhook notification to %s failed: %s", webhook_url, e)
+
+
+# ========================================
+# VIDEO ANALYSIS
+# ========================================
+VIDEO_PROGRESS_TTL = 60 * 60
+# A submission still 'processing' after this long lost its job (usually to a
+# worker restart, since the pool is in-process) and is reported as failed
+VIDEO_ANALYSIS_TIMEOUT = timedelta(minutes=60)
+
+
+def video_progress_key(submission_id):
+    return f"video_progress:{submission_id}"
+
+
+def analyze_video_submission(submission_id, video_path, frame_skip):
+    """Analyse a queued video submission, store the outcome and delete the file"""
+    def report_progress(frames_done, frames_total):
+        # Progress goes to the cache rather than the row, so polling never
+        # waits on (or adds to) database writes
+        percent = min(100, frames_done * 100 // frames_total) if frames_total > 0 else 0
+        cache.set(video_progress_key(submission_id), percent, VIDEO_PROGRESS_TTL)
+
+    try:
+        analysis_result = analyze_video(video_path, frame_skip=frame_skip, progress=report_progress)
+        video_result = analysis_result["video_summary"]
+        video_categories = video_result.get("dominant_categories", [])
+        video_result["frame_details"] = analysis_result.get("frame_results", [])
+
+        ContentSubmission.objects.filter(pk=submission_id).update(
+            classification_result=video_result,
+            detected_categories=video_categories,
+            confidence_scores=video_result.get('category_counts', {}),
+            flagged=bool(video_categories),
+            status='pending_review' if video_categories else 'auto_approved',
+            updated_at=timezone.now()
+        )
+    except Exception as e:
+        logger.exception("Video analysis failed for submission %s", submission_id)
+        ContentSubmission.objects.filter(pk=submission_id).update(
+            classification_result={'error': str(e)},
+            status='failed',
+            updated_at=timezone.now()
+        )
+    finally:
+        cache.delete(video_progress_key(submission_id))
+        if os.path.exists(video_path):
+            os.remove(video_path)
+
+
+def queue_video_analysis(submission_id, video_path, frame_skip):
+    """Hand a saved video submission to the analysis pool, failing it if the pool is full"""
+    try:
+        run_analysis(analyze_video_submission, submission_id, video_path, frame_skip)
+    except AnalysisQueueFull:
+        ContentSubmission.objects.filter(pk=submission_id).update(
+            classification_result={'error': 'Too many videos are being analysed, please try again later'},
+            status='failed',
+            updated_at=timezone.now()
+        )
+        if os.path.exists(video_path):
+            os.remove(video_path)
+
+
+def fail_stale_video_submission(submission_id):
+    """Mark a submission failed if it has been 'processing' for longer than
+    VIDEO_ANALYSIS_TIMEOUT; returns True when it did"""
+    return bool(ContentSubmission.objects.filter(
+        pk=submission_id,
+        status='processing',
+        created_at__lt=timezone.now() - VIDEO_ANALYSIS_TIMEOUT
+    ).update(
+        classification_result={'error': 'Analysis did not finish, please upload the video again'},
+        status='failed',
+        updated_at=timezone.now()
+    ))
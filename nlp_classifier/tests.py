@@ -1,3 +1,533 @@
-from django.test import TestCase
+import importlib.util
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.db.models.signals import post_save
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import api_views, classifier, tasks, view_helpers, views
+from .models import APIKey, ContentSubmission, Notification, Payment
+
+
+# ========================================
+# DIRTY FIELD TRACKING
+# ========================================
+class DirtyFieldsMixinTests(TestCase):
+    def setUp(self):
+        self.submission = ContentSubmission.objects.create(
+            content_type='text', text_content='original', status='auto_approved'
+        )
+
+    def test_save_writes_only_changed_fields(self):
+        submission = ContentSubmission.objects.get(pk=self.submission.pk)
+        # Changed by someone else after this instance was loaded
+        ContentSubmission.objects.filter(pk=submission.pk).update(text_content='concurrent')
+
+        submission.status = 'pending_review'
+        submission.save()
+
+        stored = ContentSubmission.objects.get(pk=submission.pk)
+        self.assertEqual(stored.status, 'pending_review')
+        self.assertEqual(stored.text_content, 'concurrent')
+
+    def test_assigning_a_deferred_field_is_saved(self):
+        submission = ContentSubmission.objects.only('id', 'status').get(pk=self.submission.pk)
+        submission.text_content = 'edited'
+        submission.save()
+
+        self.assertEqual(ContentSubmission.objects.get(pk=submission.pk).text_content, 'edited')
+
+    def test_unchanged_save_still_sends_signals_and_advances_auto_now(self):
+        submission = ContentSubmission.objects.get(pk=self.submission.pk)
+        before = submission.updated_at
+        saved = []
+
+        def on_save(sender, instance, **kwargs):
+            saved.append(instance.pk)
+
+        post_save.connect(on_save, sender=ContentSubmission)
+        try:
+            submission.save()
+        finally:
+            post_save.disconnect(on_save, sender=ContentSubmission)
+
+        self.assertEqual(saved, [submission.pk])
+        self.assertGreater(ContentSubmission.objects.get(pk=submission.pk).updated_at, before)
+
+    def test_saved_fields_are_clean_again(self):
+        submission = ContentSubmission.objects.only('id', 'status').get(pk=self.submission.pk)
+        submission.text_content = 'edited'
+        submission.save()
+
+        self.assertEqual(submission.get_dirty_fields(), [])
+
+
+# ========================================
+# API RATE LIMITING
+# ========================================
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('api-user', password='secret')
+        self.api_key = APIKey.objects.create(user=self.user, name='test key')
+        self.factory = RequestFactory()
+
+    def authenticate(self):
+        request = self.factory.get('/', HTTP_X_API_KEY=self.api_key.key)
+        return api_views.authenticate_api_key(request)
+
+    def test_database_counter_stops_at_the_daily_limit(self):
+        with mock.patch.object(api_views, 'SHARED_RATE_LIMIT', False):
+            results = [self.authenticate() for _ in range(self.api_key.daily_limit + 1)]
+
+        self.assertTrue(all(key is not None for key, _ in results[:-1]))
+        self.assertIsNone(results[-1][0])
+        self.api_key.refresh_from_db()
+        self.assertEqual(self.api_key.requests_today, self.api_key.daily_limit)
+
+    def test_database_counter_starts_over_on_a_new_day(self):
+        APIKey.objects.filter(pk=self.api_key.pk).update(
+            requests_today=self.api_key.daily_limit,
+            last_reset=timezone.localdate() - timedelta(days=1),
+        )
+        with mock.patch.object(api_views, 'SHARED_RATE_LIMIT', False):
+            key, error = self.authenticate()
+
+        self.assertIsNotNone(key, error)
+        self.api_key.refresh_from_db()
+        self.assertEqual(self.api_key.requests_today, 1)
+
+    def test_cache_counter_stops_at_the_daily_limit_and_syncs_periodically(self):
+        with mock.patch.object(api_views, 'SHARED_RATE_LIMIT', True):
+            for _ in range(api_views.USAGE_SYNC_INTERVAL + 1):
+                self.authenticate()
+            self.api_key.refresh_from_db()
+            self.assertEqual(self.api_key.requests_today, api_views.USAGE_SYNC_INTERVAL)
+
+            for _ in range(self.api_key.daily_limit - api_views.USAGE_SYNC_INTERVAL - 1):
+                self.assertIsNotNone(self.authenticate()[0])
+            key, error = self.authenticate()
+
+        self.assertIsNone(key)
+        self.assertEqual(error, {"error": "Daily rate limit exceeded"})
+
+    def test_cancelling_a_subscription_clears_the_cached_key(self):
+        self.api_key.activate_subscription('premium')
+        api_views.get_cached_api_key(self.api_key.key)
+        self.client.force_login(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('cancel_subscription', args=[self.api_key.id]))
+
+        self.assertEqual(api_views.get_cached_api_key(self.api_key.key).daily_limit, 50)
+
+
+# ========================================
+# PAYMENTS
+# ========================================
+class PaymentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='secret')
+        self.api_key = APIKey.objects.create(user=self.user, name='test key')
+        self.client.force_login(self.user)
+
+    def create_payment(self, **fields):
+        return Payment.objects.create(
+            user=self.user, api_key=self.api_key, amount='9.99',
+            payment_type='upgrade', tier='basic', **fields
+        )
+
+    def test_mark_completed_only_succeeds_once(self):
+        payment = self.create_payment()
+        stale_copy = Payment.objects.get(pk=payment.pk)
+
+        self.assertTrue(payment.mark_completed(payment_gateway='test'))
+        completed_at = Payment.objects.get(pk=payment.pk).completed_at
+        self.assertFalse(stale_copy.mark_completed(payment_gateway='stripe'))
+
+        stored = Payment.objects.get(pk=payment.pk)
+        self.assertEqual(stored.payment_gateway, 'test')
+        self.assertEqual(stored.completed_at, completed_at)
+
+    def test_amount_minor_units_rounds_half_up(self):
+        self.assertEqual(self.create_payment().amount_minor_units, 999)
+        self.assertEqual(Payment(amount='0.005').amount_minor_units, 1)
+
+    @mock.patch.object(views, 'PAYMENT_TEST_MODE', True)
+    def test_test_mode_upgrade_completes_in_one_request(self):
+        response = self.client.post(
+            reverse('upgrade_api_key', args=[self.api_key.id]), {'tier': 'premium'}
+        )
+
+        payment = Payment.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('payment_success', args=[payment.id]))
+        self.assertEqual((payment.status, payment.tier, payment.payment_gateway),
+                         ('completed', 'premium', 'test'))
+        self.api_key.refresh_from_db()
+        self.assertEqual((self.api_key.tier, self.api_key.daily_limit), ('premium', 10000))
+        self.assertEqual(self.api_key.subscription_status, 'active')
+        self.assertTrue(Notification.objects.filter(user=self.user, notification_type='billing').exists())
+
+    def test_upgrade_rejects_unpaid_tiers(self):
+        response = self.client.post(reverse('upgrade_api_key', args=[self.api_key.id]), {'tier': 'free'})
+
+        self.assertRedirects(response, reverse('my_api_keys'))
+        self.assertFalse(Payment.objects.exists())
+
+    def test_completed_payment_is_not_applied_twice(self):
+        payment = self.create_payment()
+        url = reverse('process_payment', args=[payment.id])
+
+        self.client.post(url, {'payment_method': 'test'})
+        APIKey.objects.filter(pk=self.api_key.pk).update(subscription_status='cancelled')
+        self.client.post(url, {'payment_method': 'test'})
+
+        self.api_key.refresh_from_db()
+        self.assertEqual(self.api_key.subscription_status, 'cancelled')
+
+
+# ========================================
+# KEYSET PAGINATION
+# ========================================
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        for minutes in [0, 1, 1, 1, 2, 3, 4]:
+            submission = ContentSubmission.objects.create(content_type='text', text_content='x')
+            # Several rows share a timestamp, so the id has to break ties
+            ContentSubmission.objects.filter(pk=submission.pk).update(
+                created_at=now - timedelta(minutes=minutes)
+            )
+        self.queryset = ContentSubmission.objects.all()
+        self.newest_first = list(self.queryset.order_by('-created_at', '-id'))
+
+    def test_older_cursors_walk_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            rows, older, _ = views.keyset_page(self.queryset, before=cursor, per_page=3)
+            seen += rows
+            if older is None:
+                break
+            cursor = older
+
+        self.assertEqual(seen, self.newest_first)
+
+    def test_newer_cursor_returns_the_previous_page(self):
+        first, older, newer = views.keyset_page(self.queryset, per_page=3)
+        self.assertIsNone(newer)
+
+        second, _, newer = views.keyset_page(self.queryset, before=older, per_page=3)
+        back, _, _ = views.keyset_page(self.queryset, after=newer, per_page=3)
+
+        self.assertEqual(second, self.newest_first[3:6])
+        self.assertEqual(back, first)
+
+    def test_malformed_cursor_shows_the_newest_page(self):
+        rows, _, newer = views.keyset_page(self.queryset, before='not-a-cursor', per_page=3)
+
+        self.assertEqual(rows, self.newest_first[:3])
+        self.assertIsNone(newer)
+
+
+# ========================================
+# VIDEO ANALYSIS
+# ========================================
+class VideoAnalysisTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', password='secret')
+        self.client.force_login(self.user)
+        self.submission = ContentSubmission.objects.create(
+            user=self.user, content_type='video', status='processing'
+        )
+
+    def test_processing_past_the_timeout_is_reported_failed(self):
+        ContentSubmission.objects.filter(pk=self.submission.pk).update(
+            created_at=timezone.now() - tasks.VIDEO_ANALYSIS_TIMEOUT - timedelta(minutes=1)
+        )
+
+        response = self.client.get(reverse('video_progress', args=[self.submission.id]))
+
+        self.assertEqual(response.json()['status'], 'failed')
+        self.assertEqual(ContentSubmission.objects.get(pk=self.submission.pk).status, 'failed')
+
+    def test_recent_processing_is_left_alone(self):
+        response = self.client.get(reverse('video_progress', args=[self.submission.id]))
+
+        self.assertEqual(response.json()['status'], 'processing')
+
+    def test_full_queue_fails_the_submission_and_removes_the_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as video:
+            pass
+        with mock.patch.object(tasks, 'run_analysis', side_effect=tasks.AnalysisQueueFull):
+            tasks.queue_video_analysis(self.submission.id, video.name, 5)
+
+        self.assertEqual(ContentSubmission.objects.get(pk=self.submission.pk).status, 'failed')
+        self.assertFalse(os.path.exists(video.name))
+
+    def test_upload_is_refused_while_the_queue_is_full(self):
+        upload = SimpleUploadedFile('clip.mp4', b'\x00\x00\x00\x18ftypmp42', content_type='video/mp4')
+        with mock.patch.object(views, 'analysis_queue_full', return_value=True):
+            response = self.client.post(reverse('video_classification'), {'video': upload})
+
+        self.assertContains(response, 'Too many videos')
+        self.assertEqual(ContentSubmission.objects.count(), 1)
+
+
+# ========================================
+# CLASSIFIER
+# ========================================
+# The classifier loads its models at import, so these tests need the ML
+# stack installed; each one replaces the models it would call with stubs.
+HAS_MODEL_DEPS = importlib.util.find_spec('torch') is not None
+
+
+class FakeCapture:
+    """Stands in for cv2.VideoCapture over frame_count frames, each filled
+    with its own 1-based frame number"""
+
+    def __init__(self, frame_count):
+        self.frame_count = frame_count
+        self.position = 0
+        self.seeks = []
+
+    def frame(self, frame_no):
+        return np.full((2, 2, 3), frame_no % 256, dtype=np.uint8)
+
+    def set(self, prop, value):
+        self.seeks.append(value)
+        self.position = value
+        return True
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def grab(self):
+        if self.position >= self.frame_count:
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        return True, self.frame(self.position)
+
+
+@unittest.skipUnless(HAS_MODEL_DEPS, 'torch is not installed')
+class PreprocessImagesTests(TestCase):
+    def setUp(self):
+        import torch
+        self.torch = torch
+        patches = [
+            mock.patch.object(classifier, 'vit_input_size', (2, 3)),
+            mock.patch.object(classifier, 'vit_mean', torch.zeros(1, 3, 1, 1)),
+            mock.patch.object(classifier, 'vit_std', torch.full((1, 3, 1, 1), 0.5)),
+            mock.patch.object(classifier, 'device', torch.device('cpu')),
+            mock.patch.object(classifier, 'model_dtype', torch.float32),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_resizes_and_normalizes_each_image(self):
+        images = [np.full((10, 20, 3), 51, dtype=np.uint8), np.full((40, 8, 3), 102, dtype=np.uint8)]
+
+        pixel_values = classifier.preprocess_images(images)
+
+        self.assertEqual(tuple(pixel_values.shape), (2, 3, 2, 3))
+        self.assertEqual(pixel_values.dtype, self.torch.float32)
+        self.assertTrue(self.torch.allclose(pixel_values[0], self.torch.full((3, 2, 3), 0.4)))
+        self.assertTrue(self.torch.allclose(pixel_values[1], self.torch.full((3, 2, 3), 0.8)))
+
+    def test_bgr_input_is_swapped_to_rgb(self):
+        image = np.empty((4, 6, 3), dtype=np.uint8)
+        image[...] = (0, 51, 255)  # B, G, R
+
+        pixel_values = classifier.preprocess_images([image], bgr=True)
+
+        self.assertTrue(self.torch.allclose(pixel_values[0, :, 0, 0], self.torch.tensor([2.0, 0.4, 0.0])))
+
+
+@unittest.skipUnless(HAS_MODEL_DEPS, 'torch is not installed')
+class ClassifyImageBatchTests(TestCase):
+    def test_pairs_each_image_with_its_outputs_and_skips_nudenet_failures(self):
+        def nudenet_output(image):
+            if image[0, 0, 0] == 2:
+                raise RuntimeError('detector failed')
+            return {'is_nude': image[0, 0, 0] == 1, 'detections': [], 'score': 0.0}
+
+        images = np.stack([np.full((2, 2, 3), value, dtype=np.uint8) for value in (0, 1, 2)])
+        illicit = [{'label': f'label-{i}', 'score': 90.0, 'all_probs': {}} for i in range(3)]
+
+        with mock.patch.object(classifier, 'nudenet_output', side_effect=nudenet_output), \
+                mock.patch.object(classifier, 'illicit_model_outputs', return_value=illicit) as model, \
+                self.assertLogs(classifier.logger, 'WARNING'):
+            results = classifier.classify_image_batch(images)
+
+        self.assertEqual(model.call_count, 1)
+        self.assertEqual(results[0][1], ['Detected Category → label-0'])
+        self.assertEqual(results[1][1], ['Nudity', 'Detected Category → label-1'])
+        self.assertIsNone(results[2])
+
+
+@unittest.skipUnless(HAS_MODEL_DEPS, 'torch is not installed')
+class SampleFramesTests(TestCase):
+    def sample(self, frame_count, frame_skip):
+        cap = FakeCapture(frame_count)
+        frames = list(classifier.sample_frames(cap, frame_skip))
+        for frame_no, frame in frames:
+            self.assertEqual(frame[0, 0, 0], frame_no % 256)
+        return [frame_no for frame_no, _ in frames], cap.seeks
+
+    def test_small_skips_decode_every_frame_in_order(self):
+        frame_nos, seeks = self.sample(23, 5)
+
+        self.assertEqual(frame_nos, [5, 10, 15, 20])
+        self.assertEqual(seeks, [])
+
+    def test_large_skips_seek_to_the_same_frames(self):
+        skip = classifier.SEEK_MIN_FRAME_SKIP
+        frame_nos, seeks = self.sample(skip * 3 + 1, skip)
+
+        self.assertEqual(frame_nos, [skip, skip * 2, skip * 3])
+        # Zero-based positions, plus the one that ran past the end
+        self.assertEqual(seeks, [skip - 1, skip * 2 - 1, skip * 3 - 1, skip * 4 - 1])
+
+    def test_seek_and_grab_agree(self):
+        skip = classifier.SEEK_MIN_FRAME_SKIP
+        with mock.patch.object(classifier, 'SEEK_MIN_FRAME_SKIP', skip + 1):
+            grabbed, _ = self.sample(200, skip)
+        seeked, _ = self.sample(200, skip)
+
+        self.assertEqual(grabbed, seeked)
+
+
+@unittest.skipUnless(HAS_MODEL_DEPS, 'torch is not installed')
+class CategoryRuleTests(TestCase):
+    def categories(self, text='', **scores):
+        named = {label: 0.0 for label in classifier.FORMATTED_LABELS}
+        named.update({label.replace('_', ' '): score for label, score in scores.items()})
+        return classifier.map_detoxify_to_category(named, text)
+
+    def test_threshold_matrix_outcomes(self):
+        cases = [
+            ({}, []),
+            ({'Threat': 60}, []),  # thresholds are strict
+            ({'Threat': 61}, ['Violence']),
+            ({'Toxicity': 71, 'Severe_Toxicity': 41}, ['Violence']),
+            ({'Obscene': 31, 'Sexual_Explicit': 21}, ['Profanity']),
+            ({'Obscene': 31, 'Sexual_Explicit': 20}, []),
+            ({'Insult': 71, 'Toxicity': 51}, ['Cyberbullying']),
+            ({'Identity_Attack': 51, 'Toxicity': 61}, ['Hate Speech']),
+            ({'Insult': 51, 'Toxicity': 51, 'Threat': 51}, ['Harassment']),
+            ({'Identity_Attack': 51, 'Toxicity': 51, 'Threat': 51}, ['Harassment']),
+        ]
+        for scores, expected in cases:
+            with self.subTest(scores=scores):
+                self.assertEqual(self.categories(**scores), expected)
+
+    def test_terrorism_needs_a_keyword(self):
+        scores = {'Threat': 71, 'Identity_Attack': 41}
+
+        self.assertEqual(self.categories('they will bomb it', **scores), ['Violence', 'Terrorism'])
+        self.assertEqual(self.categories('they will visit it', **scores), ['Violence'])
+
+    def test_every_category_is_reported_once_in_rule_order(self):
+        scores = {'Threat': 75, 'Toxicity': 75, 'Severe_Toxicity': 45,
+                  'Identity_Attack': 55, 'Insult': 75}
+
+        self.assertEqual(
+            self.categories('an attack', **scores),
+            ['Violence', 'Terrorism', 'Harassment', 'Hate Speech', 'Cyberbullying'],
+        )
+
+    def test_vector_and_dict_forms_agree(self):
+        scores_vec = np.array([71.0, 41.0, 31.0, 41.0, 71.0, 71.0, 21.0])
+        named = dict(zip(classifier.FORMATTED_LABELS, scores_vec))
+
+        self.assertEqual(
+            classifier.map_detoxify_to_category_vec(scores_vec, 'jihad'),
+            classifier.map_detoxify_to_category(named, 'jihad'),
+        )
+
+
+@unittest.skipUnless(HAS_MODEL_DEPS, 'torch is not installed')
+class TerrorismPatternTests(TestCase):
+    def test_matches(self):
+        for text in ['BOMB', 'a Jihad', 'terrorist cell', 'counterattack', 'the Islamic State group']:
+            with self.subTest(text=text):
+                self.assertIsNotNone(classifier.TERRORISM_PATTERN.search(text))
+
+    def test_non_matches(self):
+        for text in ['', 'a peaceful protest', 'islamic', 'state of the art', 'islamic  state', 'ji had']:
+            with self.subTest(text=text):
+                self.assertIsNone(classifier.TERRORISM_PATTERN.search(text))
+
+
+# ========================================
+# VIEW HELPERS
+# ========================================
+class DecodeImageTests(TestCase):
+    def decoded_shape(self, width, height):
+        _, encoded = cv2.imencode('.png', np.zeros((height, width, 3), dtype=np.uint8))
+        return view_helpers.decode_image(encoded.tobytes()).shape
+
+    def test_large_images_are_shrunk_to_the_max_side(self):
+        self.assertEqual(self.decoded_shape(2560, 1440), (720, 1280, 3))
+        self.assertEqual(self.decoded_shape(1000, 3000), (1280, 427, 3))
+
+    def test_small_images_keep_their_size(self):
+        self.assertEqual(self.decoded_shape(640, 480), (480, 640, 3))
+        self.assertEqual(self.decoded_shape(1280, 720), (720, 1280, 3))
+
+    def test_undecodable_bytes_raise(self):
+        with self.assertRaises(ValueError):
+            view_helpers.decode_image(b'not an image')
+
+
+class SaveUploadToTempfileTests(TestCase):
+    payload = os.urandom(view_helpers.COPY_BUFFER_SIZE * 2 + 123)
+
+    def on_disk_upload(self):
+        upload = TemporaryUploadedFile('clip.mp4', 'video/mp4', len(self.payload), None)
+        upload.write(self.payload)
+        upload.flush()
+        self.addCleanup(upload.close)
+        return upload
+
+    def saved_bytes(self, upload):
+        path = view_helpers.save_upload_to_tempfile(upload, suffix='.mp4')
+        self.addCleanup(os.remove, path)
+        self.assertTrue(path.endswith('.mp4'))
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_on_disk_upload_is_linked(self):
+        upload = self.on_disk_upload()
+        with mock.patch('os.sendfile') as sendfile:
+            self.assertEqual(self.saved_bytes(upload), self.payload)
+        sendfile.assert_not_called()
+
+    @unittest.skipUnless(hasattr(os, 'sendfile'), 'os.sendfile is not available')
+    def test_on_disk_upload_falls_back_to_sendfile(self):
+        upload = self.on_disk_upload()
+        with mock.patch('os.link', side_effect=OSError), \
+                mock.patch('os.sendfile', wraps=os.sendfile) as sendfile:
+            self.assertEqual(self.saved_bytes(upload), self.payload)
+        sendfile.assert_called()
+
+    def test_in_memory_upload_is_copied(self):
+        upload = SimpleUploadedFile('clip.mp4', self.payload, content_type='video/mp4')
+        upload.read(10)  # the copy must start from the beginning regardless
+        self.assertEqual(self.saved_bytes(upload), self.payload)
@@ -1,9 +1,22 @@
 # fetch_text.py
 
-import requests
+import hashlib
+
 from bs4 import BeautifulSoup
+from django.core.cache import cache
 from newspaper import Article
-from requests_html import HTMLSession
+from requests_html import HTML, HTMLSession
+
+from .http_client import fetch_bytes
+
+USER_AGENT = "Mozilla/5.0"
+FETCH_CACHE_TTL = 60 * 60
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+RENDER_TIMEOUT = 20
+
+# Static extraction shorter than this is probably a JS shell, so it is
+# worth paying for a headless render.
+MIN_STATIC_TEXT_LENGTH = 500
 
 
 def fetch_text_from_url(url):
@@ -11,44 +24,70 @@ def fetch_text_from_url(url):
     Fetch and extract readable text from any webpage (including JS-rendered).
     Automatically handles fallbacks if one method fails.
     """
-    # 1️⃣ Try newspaper3k (best for news/article content)
-    try:
-        article = Article(url)
-        article.download()
-        article.parse()
-        if article.text.strip():
-            return article.text
-    except Exception:
-        pass
+    cache_key = "urltext:" + hashlib.sha256(url.encode()).hexdigest()
+    text = cache.get(cache_key)
+    if text is None:
+        text = extract_text(url)
+        if text:
+            cache.set(cache_key, text, FETCH_CACHE_TTL)
 
-    # 2️⃣ Try BeautifulSoup with requests (fast for static pages)
+    return text or "Failed to extract text from the given URL."
+
+
+def extract_text(url):
+    # The page is downloaded once and shared by the static parsers
+    html = ""
     try:
-        response = requests.get(url, timeout=15, headers={"User-Agent": "Mozilla/5.0"})
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # Remove unwanted tags
-        for tag in soup(["script", "style", "noscript"]):
-            tag.extract()
-
-        text = " ".join(soup.get_text().split())
-        if text.strip():
-            print(text)
-            return text
+        response, body = fetch_bytes(
+            url, max_bytes=MAX_PAGE_BYTES, timeout=(3, 15), headers={"User-Agent": USER_AGENT}
+        )
+        html = body.decode(response.encoding or "utf-8", errors="replace")
     except Exception:
         pass
 
-    # 3️⃣ Try rendering JavaScript content using requests_html
+    if html:
+        # 1️⃣ Try newspaper3k (best for news/article content)
+        try:
+            article = Article(url)
+            article.download(input_html=html)
+            article.parse()
+            if article.text.strip():
+                return article.text
+        except Exception:
+            pass
+
+    # 2️⃣ Try BeautifulSoup on the same HTML (fast for static pages)
+    text = ""
+    if html:
+        try:
+            soup = BeautifulSoup(html, "lxml")
+
+            # Remove unwanted tags
+            for tag in soup(["script", "style", "noscript"]):
+                tag.extract()
+
+            text = " ".join(soup.get_text().split())
+        except Exception:
+            pass
+    if len(text) >= MIN_STATIC_TEXT_LENGTH:
+        return text
+
+    # 3️⃣ Try rendering JavaScript content using requests_html. Only pages
+    # that passed the capped download are rendered, and the document is
+    # reused rather than fetched again without limits; the browser's own
+    # navigation is bounded by the render timeout.
+    if not html:
+        return text
+    render_session = HTMLSession()
     try:
-        session = HTMLSession()
-        response = session.get(url)
-        response.html.render(timeout=30, sleep=2)
-        text = " ".join(response.html.text.split())
-        if text.strip():
-            print(text)
-            return text
+        page = HTML(session=render_session, url=url, html=html)
+        page.render(timeout=RENDER_TIMEOUT, sleep=2)
+        rendered = " ".join(page.text.split())
+        if rendered:
+            return rendered
     except Exception:
         pass
+    finally:
+        render_session.close()
 
-    # If all fail
-    return "Failed to extract text from the given URL."
+    return text
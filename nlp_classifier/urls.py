@@ -17,6 +17,8 @@ urlpatterns = [
     path('text/', text_classification_view, name='text_classification'),
     path('image/', image_classification_view, name='image_classification'),
     path('video/', video_classification_view, name='video_classification'),
+    path('video/<int:submission_id>/', video_result_view, name='video_result'),
+    path('video/<int:submission_id>/progress/', video_progress_view, name='video_progress'),
     
     # Admin views
     path('admin-panel/', admin_dashboard, name='admin_dashboard'),
@@ -36,6 +38,7 @@ urlpatterns = [
     path('payment/success/<int:payment_id>/', payment_success, name='payment_success'),
     path('payment/cancel/', payment_cancel, name='payment_cancel'),
     path('payment/razorpay/callback/', razorpay_payment_callback, name='razorpay_payment_callback'),
+    path('payment/stripe/intent/<int:payment_id>/', stripe_payment_intent, name='stripe_payment_intent'),
     path('subscription/cancel/<int:key_id>/', cancel_subscription, name='cancel_subscription'),
     
     # Notifications
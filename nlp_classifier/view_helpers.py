@@ -0,0 +1,107 @@
+"""
+Helpers shared by the HTML views and the REST API views.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+import orjson
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .http_client import fetch_to_file
+
+COPY_BUFFER_SIZE = 1 << 20  # 1 MB
+MAX_IMAGE_SIDE = 1280
+INFERENCE_CACHE_TTL = 60 * 60 * 24
+URL_INFERENCE_CACHE_TTL = 60 * 10  # remote content can change under the same URL
+MAX_VIDEO_DOWNLOAD_BYTES = 500 * 1024 * 1024  # same as the video upload limit
+VIDEO_DOWNLOAD_DEADLINE = 120
+
+
+def cached_infer(kind, payload, infer, timeout=INFERENCE_CACHE_TTL):
+    """
+    Return infer()'s result for payload (bytes) from the shared cache,
+    running the model only on a miss.
+    """
+    key = f"infer:{kind}:{hashlib.sha256(payload).hexdigest()}"
+    result = cache.get(key)
+    if result is None:
+        result = infer()
+        cache.set(key, result, timeout)
+    return result
+
+
+EMPTY_JSON = mark_safe('{}')
+
+
+def safe_json(data):
+    """Serialize a result dict for embedding in a template script block"""
+    return mark_safe(orjson.dumps(data).decode()) if data else EMPTY_JSON
+
+
+def decode_image(data):
+    """Decode encoded image bytes into the BGR array classify_image expects"""
+    img_bgr = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img_bgr is None:
+        raise ValueError("Could not decode image")
+
+    # Both models work at well under this size, so shrinking huge photos
+    # once here saves every later copy and resize from touching 4K pixels
+    height, width = img_bgr.shape[:2]
+    scale = MAX_IMAGE_SIDE / max(height, width)
+    if scale < 1:
+        img_bgr = cv2.resize(img_bgr, (round(width * scale), round(height * scale)),
+                             interpolation=cv2.INTER_AREA)
+    return img_bgr
+
+
+def save_upload_to_tempfile(uploaded_file, suffix):
+    """
+    Write an uploaded file to a named temporary file and return its path.
+    Uploads Django has already spooled to disk are hard-linked, or copied
+    in the kernel with sendfile when a link is not possible.
+    """
+    on_disk = hasattr(uploaded_file, 'temporary_file_path')
+    if on_disk:
+        with tempfile.NamedTemporaryFile(suffix=suffix) as placeholder:
+            temp_path = placeholder.name
+        try:
+            os.link(uploaded_file.temporary_file_path(), temp_path)
+            return temp_path
+        except OSError:
+            pass  # e.g. upload dir on another filesystem - copy instead
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        if on_disk and hasattr(os, 'sendfile'):
+            with open(uploaded_file.temporary_file_path(), 'rb') as source:
+                offset, size = 0, uploaded_file.size
+                while offset < size:
+                    sent = os.sendfile(temp_file.fileno(), source.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+        else:
+            uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, temp_file, COPY_BUFFER_SIZE)
+        return temp_file.name
+
+
+def download_to_tempfile(url, suffix, max_bytes=MAX_VIDEO_DOWNLOAD_BYTES,
+                         deadline=VIDEO_DOWNLOAD_DEADLINE):
+    """
+    Stream a remote file to a named temporary file and return its path.
+    The partial file is removed if the download is too large or too slow.
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        try:
+            fetch_to_file(url, temp_file, max_bytes=max_bytes, deadline=deadline)
+        except BaseException:
+            temp_file.close()
+            os.remove(temp_file.name)
+            raise
+        return temp_file.name
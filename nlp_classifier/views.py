@@ -1,25 +1,36 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse
+from django.http import JsonResponse
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Count, Q
-import json
-import tempfile
-import os
-import numpy as np
-from PIL import Image
-import requests
-from io import BytesIO
-import cv2
-from django.utils.safestring import mark_safe
-import tempfile
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import hashlib
+
+import razorpay
 
 from .forms import *
 from .models import UserProfile, ContentSubmission, AdminReview, APIKey, Notification, BillingRecord, Payment
-from .classifier import classify_text, classify_image, analyze_video
+from .classifier import classify_text, classify_image
 from .twitter_api import fetch_text_from_url
+from .http_client import fetch_bytes
+from .payment_clients import get_razorpay_client, get_stripe_client
+from .tasks import (
+    analysis_queue_full, queue_video_analysis, fail_stale_video_submission, video_progress_key,
+)
+from .view_helpers import (
+    cached_infer, decode_image, safe_json, save_upload_to_tempfile,
+    INFERENCE_CACHE_TTL, URL_INFERENCE_CACHE_TTL,
+)
 
 
 # ========================================
@@ -30,6 +41,74 @@ def is_admin(user):
     return user.is_authenticated and hasattr(user, 'profile') and user.profile.role == 'admin'
 
 
+# Columns rendered by the admin submission listings
+ADMIN_LISTING_FIELDS = [
+    'id', 'content_type', 'status', 'text_content', 'content_url',
+    'detected_categories', 'is_from_api', 'created_at', 'user__username',
+]
+SUBMISSIONS_PER_PAGE = 50
+BILLING_LISTING_FIELDS = [
+    'total_requests', 'free_requests_used', 'paid_requests', 'amount_charged',
+    'last_updated', 'user__username', 'user__email',
+]
+
+
+def submissions_for_admin():
+    """Submissions for admin listings, joined with the user and narrowed to the listed columns"""
+    return ContentSubmission.objects.select_related('user').only(*ADMIN_LISTING_FIELDS)
+
+
+# Listing pages are positioned by a "<created_at in epoch microseconds>.<id>"
+# cursor instead of an OFFSET, so deep pages cost the same as the first
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(submission):
+    micros = (submission.created_at - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{submission.id}"
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is malformed"""
+    try:
+        micros, pk = cursor.split('.')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def keyset_page(queryset, before=None, after=None, per_page=SUBMISSIONS_PER_PAGE):
+    """
+    One page of queryset, newest first: the rows older than the `before`
+    cursor, or newer than the `after` cursor, or the newest rows if neither
+    is given. Returns (rows, older_cursor, newer_cursor); a cursor is None
+    when there is nothing further in that direction.
+    """
+    before, after = decode_cursor(before), decode_cursor(after)
+    if after:
+        created_at, pk = after
+        rows = list(queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        ).order_by('created_at', 'id')[:per_page + 1])
+        has_newer, has_older = len(rows) > per_page, True
+        rows = rows[:per_page][::-1]
+    else:
+        if before:
+            created_at, pk = before
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        rows = list(queryset.order_by('-created_at', '-id')[:per_page + 1])
+        has_newer, has_older = bool(before), len(rows) > per_page
+        rows = rows[:per_page]
+
+    if not rows:
+        return rows, None, None
+    older_cursor = encode_cursor(rows[-1]) if has_older else None
+    newer_cursor = encode_cursor(rows[0]) if has_newer else None
+    return rows, older_cursor, newer_cursor
+
+
 # ========================================
 # AUTHENTICATION VIEWS
 # ========================================
@@ -106,12 +185,17 @@ def landing_page(request):
 def dashboard(request):
     """User dashboard with statistics"""
     user_submissions = ContentSubmission.objects.filter(user=request.user)
+    stats = user_submissions.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending_review')),
+        flagged=Count('id', filter=Q(flagged=True)),
+    )
     
     context = {
-        'total_submissions': user_submissions.count(),
-        'pending_reviews': user_submissions.filter(status='pending_review').count(),
-        'flagged_content': user_submissions.filter(flagged=True).count(),
-        'recent_submissions': user_submissions[:5]
+        'total_submissions': stats['total'],
+        'pending_reviews': stats['pending'],
+        'flagged_content': stats['flagged'],
+        'recent_submissions': user_submissions.only('id', 'content_type', 'status', 'created_at')[:5]
     }
     return render(request, 'dashboard.html', context)
 
@@ -144,7 +228,10 @@ def text_classification_view(request):
 
             if input_text and not error_message:
                 try:
-                    scores, root_words, text_categories, detected_lang, text_conclusion = classify_text(input_text)
+                    # Whitespace-only differences map to the same cached result
+                    scores, root_words, text_categories, detected_lang, text_conclusion = cached_infer(
+                        'text', " ".join(input_text.split()).encode(), lambda: classify_text(input_text)
+                    )
                     text_result = scores
                     
                     # Save submission to database
@@ -169,10 +256,7 @@ def text_classification_view(request):
                     error_message = str(e)
 
     else:
-        form = TextInputForm()
-
-    def safe_json(data):
-        return mark_safe(json.dumps(data)) if data else mark_safe('{}')
+        form = get_unbound(TextInputForm)
 
     return render(request, 'text_classification.html', {
         'form': form,
@@ -197,33 +281,46 @@ def image_classification_view(request):
 
     if request.method == 'POST':
         form = ImageInputForm(request.POST, request.FILES)
-        image_input = None
+        load_image = None
         file_path = None
 
         if form.is_valid():
+            # The result cache is checked before decoding an upload or
+            # downloading a URL, so repeat submissions skip both
             if 'image' in request.FILES:
                 try:
                     image_file = request.FILES['image']
-                    image_input = Image.open(image_file).convert("RGB")
-                    image_input = np.array(image_input)
-                    # Save file path for database
-                    file_path = f"temp_{image_file.name}"
+                    image_bytes = image_file.read()
+                    cache_args = ('image', image_bytes)
+                    cache_ttl = INFERENCE_CACHE_TTL
+
+                    def load_image():
+                        try:
+                            return decode_image(image_bytes)
+                        except Exception:
+                            raise ValueError("Failed to process uploaded image.")
+                    # The upload is decoded from memory; only its name is recorded
+                    file_path = image_file.name
                 except Exception:
                     error_message = "Failed to process uploaded image."
             elif request.POST.get('image_url'):
+                img_url = request.POST.get('image_url')
+                cache_args = ('image_url', img_url.encode())
+                cache_ttl = URL_INFERENCE_CACHE_TTL
+
+                def load_image():
+                    try:
+                        _, body = fetch_bytes(img_url)
+                        return decode_image(body)
+                    except Exception:
+                        raise ValueError("Failed to fetch or decode image from URL.")
+                file_path = img_url
+
+            if load_image is not None and not error_message:
                 try:
-                    img_url = request.POST.get('image_url')
-                    resp = requests.get(img_url, timeout=10)
-                    resp.raise_for_status()
-                    image_input = Image.open(BytesIO(resp.content)).convert("RGB")
-                    image_input = np.array(image_input)
-                    file_path = img_url
-                except Exception:
-                    error_message = "Failed to fetch or decode image from URL."
-
-            if image_input is not None and not error_message:
-                try:
-                    img_results, image_categories, image_conclusion = classify_image(image_input)
+                    img_results, image_categories, image_conclusion = cached_infer(
+                        *cache_args, lambda: classify_image(load_image()), timeout=cache_ttl
+                    )
                     image_result = img_results
                     if "nudenet" in img_results:
                         image_detections = img_results.get("nudenet", {}).get("detections", [])
@@ -249,7 +346,7 @@ def image_classification_view(request):
                 except Exception as e:
                     error_message = f"Failed to process image. Error: {str(e)}"
     else:
-        form = ImageInputForm()
+        form = get_unbound(ImageInputForm)
 
     return render(request, 'image_classification.html', {
         'form': form,
@@ -265,61 +362,74 @@ def image_classification_view(request):
 
 @login_required
 def video_classification_view(request):
-    video_result = {}
-    video_categories = []
-    video_conclusion = ""
     error_message = ""
 
     if request.method == 'POST' and 'video' in request.FILES:
         form = ImageInputForm(request.POST, request.FILES)
-        if form.is_valid():
+        if form.is_valid() and analysis_queue_full():
+            error_message = "Too many videos are being analysed right now. Please try again in a few minutes."
+        elif form.is_valid():
             try:
                 video_file = request.FILES['video']
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_video:
-                    for chunk in video_file.chunks():
-                        temp_video.write(chunk)
-                    temp_video_path = temp_video.name
-
-                analysis_result = analyze_video(temp_video_path, frame_skip=5)
-                video_result = analysis_result["video_summary"]
-                frame_results = analysis_result.get("frame_results", [])
-
-                video_categories = video_result.get("dominant_categories", [])
-                if video_categories:
-                    video_conclusion = f"Video likely contains content: {', '.join(video_categories)}"
-                else:
-                    video_conclusion = "No significant illicit categories detected."
-
-                video_result["frame_details"] = frame_results
-                
-                # Save submission to database
+                # Not deleted here: the background job removes it when done
+                temp_video_path = save_upload_to_tempfile(video_file, suffix=".mp4")
+
                 submission = ContentSubmission.objects.create(
                     user=request.user,
                     content_type='video',
                     file_path=temp_video_path,
-                    classification_result=video_result,
-                    detected_categories=video_categories,
-                    confidence_scores=video_result.get('category_counts', {}),
-                    flagged=bool(video_categories),
-                    status='pending_review' if video_categories else 'auto_approved'
+                    status='processing'
                 )
-                
-                if video_categories:
-                    messages.warning(request, 'Video flagged for admin review.')
-                else:
-                    messages.success(request, 'Video classified successfully.')
-                
-                # Clean up temp file
-                if os.path.exists(temp_video_path):
-                    os.remove(temp_video_path)
+
+                # Analysis takes minutes on long videos, so it runs off the
+                # request thread and the result page polls for the outcome
+                transaction.on_commit(lambda: queue_video_analysis(
+                    submission.id, temp_video_path, 5
+                ))
+                messages.info(request, 'Video uploaded. Analysis is running in the background.')
+                return redirect('video_result', submission_id=submission.id)
 
             except Exception as e:
                 error_message = f"Failed to analyze video. Error: {str(e)}"
     else:
-        form = ImageInputForm()
+        form = get_unbound(ImageInputForm)
 
     return render(request, 'video_classification.html', {
         'form': form,
+        'error_message': error_message,
+    })
+
+
+@login_required
+def video_result_view(request, submission_id):
+    """Show a video submission's analysis, refreshing while it is still running"""
+    submission = get_object_or_404(
+        ContentSubmission, id=submission_id, user=request.user, content_type='video'
+    )
+
+    if submission.status == 'processing' and fail_stale_video_submission(submission.id):
+        submission.refresh_from_db()
+
+    video_result = {}
+    video_categories = []
+    video_conclusion = ""
+    error_message = ""
+
+    if submission.status == 'failed':
+        error_message = f"Failed to analyze video. Error: {(submission.classification_result or {}).get('error', '')}"
+    elif submission.status != 'processing':
+        video_result = submission.classification_result or {}
+        video_categories = submission.detected_categories
+        if video_categories:
+            video_conclusion = f"Video likely contains content: {', '.join(video_categories)}"
+        else:
+            video_conclusion = "No significant illicit categories detected."
+
+    return render(request, 'video_classification.html', {
+        'form': get_unbound(ImageInputForm),
+        'submission': submission,
+        'progress': cache.get(video_progress_key(submission.id), 0),
+        'processing': submission.status == 'processing',
         'video_result': video_result,
         'video_categories': video_categories,
         'video_conclusion': video_conclusion,
@@ -327,6 +437,21 @@ def video_classification_view(request):
     })
 
 
+@login_required
+def video_progress_view(request, submission_id):
+    """Status and percent complete of a video submission, polled by the result page"""
+    status = get_object_or_404(
+        ContentSubmission.objects.values_list('status', flat=True),
+        id=submission_id, user=request.user, content_type='video'
+    )
+    if status == 'processing' and fail_stale_video_submission(submission_id):
+        status = 'failed'
+    return JsonResponse({
+        'status': status,
+        'progress': cache.get(video_progress_key(submission_id), 0) if status == 'processing' else 100,
+    })
+
+
 # ========================================
 # ADMIN VIEWS
 # ========================================
@@ -334,16 +459,19 @@ def video_classification_view(request):
 @user_passes_test(is_admin)
 def admin_dashboard(request):
     """Admin dashboard with content moderation overview"""
-    pending_submissions = ContentSubmission.objects.filter(status='pending_review')
-    
     # Statistics
-    total_pending = pending_submissions.count()
+    stats = ContentSubmission.objects.aggregate(
+        pending=Count('id', filter=Q(status='pending_review')),
+        approved=Count('id', filter=Q(status='approved')),
+        rejected=Count('id', filter=Q(status='rejected')),
+    )
+    total_pending = stats['pending']
     total_reviewed = AdminReview.objects.count()
-    total_approved = ContentSubmission.objects.filter(status='approved').count()
-    total_rejected = ContentSubmission.objects.filter(status='rejected').count()
+    total_approved = stats['approved']
+    total_rejected = stats['rejected']
     
     # Recent submissions
-    recent_submissions = pending_submissions.order_by('-created_at')[:10]
+    recent_submissions = submissions_for_admin().filter(status='pending_review').order_by('-created_at')[:10]
     
     context = {
         'total_pending': total_pending,
@@ -404,14 +532,18 @@ def all_submissions(request):
     """View all submissions with filtering"""
     status_filter = request.GET.get('status', 'all')
     
-    submissions = ContentSubmission.objects.all()
+    submissions = submissions_for_admin()
     if status_filter != 'all':
         submissions = submissions.filter(status=status_filter)
     
-    submissions = submissions.order_by('-created_at')
+    submissions, older_cursor, newer_cursor = keyset_page(
+        submissions, before=request.GET.get('before'), after=request.GET.get('after')
+    )
     
     context = {
         'submissions': submissions,
+        'older_cursor': older_cursor,
+        'newer_cursor': newer_cursor,
         'status_filter': status_filter,
     }
     return render(request, 'all_submissions.html', context)
@@ -474,8 +606,7 @@ def my_api_keys(request):
             APIKey.objects.create(
                 user=request.user,
                 name=name,
-                tier='free',
-                daily_limit=50
+                tier='free'
             )
             messages.success(request, f'API key "{name}" created successfully!')
             return redirect('my_api_keys')
@@ -494,6 +625,7 @@ def delete_api_key(request, key_id):
     """Delete an API key"""
     api_key = get_object_or_404(APIKey, id=key_id, user=request.user)
     key_name = api_key.name
+    api_key.clear_cached_lookup()
     api_key.delete()
     messages.success(request, f'API key "{key_name}" deleted successfully!')
     return redirect('my_api_keys')
@@ -524,7 +656,7 @@ def notifications_view(request):
         if notification_id:
             notification = get_object_or_404(Notification, id=notification_id, user=request.user)
             notification.is_read = True
-            notification.save()
+            notification.save(update_fields=['is_read'])
             return redirect('notifications')
     
     # Count unread
@@ -544,40 +676,35 @@ def notifications_view(request):
 @user_passes_test(is_admin)
 def admin_billing_dashboard(request):
     """Admin dashboard for billing information"""
-    from django.db.models import Sum
-    from datetime import datetime
-    
     # Get current month/year
-    now = datetime.now()
-    current_month = now.month
-    current_year = now.year
+    today = timezone.localdate()
+    current_month = today.month
+    current_year = today.year
     
     # Get all billing records for current month
     current_month_records = BillingRecord.objects.filter(
         year=current_year,
         month=current_month
-    ).select_related('user')
+    ).select_related('user').only(*BILLING_LISTING_FIELDS)
     
     # Calculate totals
-    total_revenue = current_month_records.aggregate(Sum('amount_charged'))['amount_charged__sum'] or 0
-    total_requests = current_month_records.aggregate(Sum('total_requests'))['total_requests__sum'] or 0
-    total_paid_requests = current_month_records.aggregate(Sum('paid_requests'))['paid_requests__sum'] or 0
+    totals = BillingRecord.monthly_revenue(current_year, current_month)
     
     # Get top users by revenue
     top_users = current_month_records.order_by('-amount_charged')[:10]
     
-    # Get all users with API keys
-    users_with_keys = User.objects.filter(api_keys__isnull=False).distinct()
+    # Count users with API keys straight off the key table, no join needed
+    users_with_keys_count = APIKey.objects.values('user_id').distinct().count()
     
     context = {
         'current_month': current_month,
         'current_year': current_year,
         'current_month_records': current_month_records,
-        'total_revenue': total_revenue,
-        'total_requests': total_requests,
-        'total_paid_requests': total_paid_requests,
+        'total_revenue': totals['total_revenue'],
+        'total_requests': totals['total_requests'],
+        'total_paid_requests': totals['total_paid_requests'],
         'top_users': top_users,
-        'users_with_keys': users_with_keys,
+        'users_with_keys_count': users_with_keys_count,
     }
     return render(request, 'admin_billing_dashboard.html', context)
 
@@ -586,22 +713,22 @@ def admin_billing_dashboard(request):
 @user_passes_test(is_admin)
 def admin_user_billing_detail(request, user_id):
     """Detailed billing information for a specific user"""
-    from django.contrib.auth.models import User
-    
     target_user = get_object_or_404(User, id=user_id)
     billing_records = BillingRecord.objects.filter(user=target_user).order_by('-year', '-month')
     api_keys = APIKey.objects.filter(user=target_user)
     
-    # Calculate totals
-    total_all_time = sum(record.amount_charged for record in billing_records)
-    total_requests_all_time = sum(record.total_requests for record in billing_records)
+    # Calculate totals in the database rather than over every loaded record
+    totals = billing_records.aggregate(
+        amount=Coalesce(Sum('amount_charged'), Value(Decimal('0.00'))),
+        requests=Coalesce(Sum('total_requests'), 0),
+    )
     
     context = {
         'target_user': target_user,
         'billing_records': billing_records,
         'api_keys': api_keys,
-        'total_all_time': total_all_time,
-        'total_requests_all_time': total_requests_all_time,
+        'total_all_time': totals['amount'],
+        'total_requests_all_time': totals['requests'],
     }
     return render(request, 'admin_user_billing_detail.html', context)
 
@@ -609,30 +736,114 @@ def admin_user_billing_detail(request, user_id):
 # ========================================
 # PAYMENT & UPGRADE VIEWS
 # ========================================
+# Payment settings are fixed for the life of the process
+PAYMENT_TEST_MODE = getattr(settings, 'PAYMENT_TEST_MODE', True)
+PAYMENT_GATEWAY_PREFERENCE = getattr(settings, 'PAYMENT_GATEWAY_PREFERENCE', 'auto')
+RAZORPAY_KEY_ID = getattr(settings, 'RAZORPAY_KEY_ID', None)
+
+# Columns the upgrade form and the payment receipt actually read (the key
+# string is needed to clear its cached lookup when the tier changes)
+UPGRADE_KEY_FIELDS = ['id', 'user', 'key', 'name', 'tier']
+PAYMENT_RECEIPT_FIELDS = [
+    'id', 'amount', 'payment_type', 'status', 'completed_at',
+    'payment_gateway', 'stripe_payment_intent_id',
+    'api_key', 'api_key__name', 'api_key__daily_limit',
+]
+
+
+def apply_upgrade(payment, notice):
+    """Activate the tier a completed payment bought and notify its user.
+    Called inside the payment's transaction, so all three commit together."""
+    if payment.api_key:
+        payment.api_key.activate_subscription(payment.tier or 'basic')
+    Notification.objects.create(
+        user_id=payment.user_id,
+        title='Payment Successful',
+        message=notice,
+        notification_type='billing'
+    )
+
+
+def complete_stripe_payment(payment_id):
+    """
+    Complete a Stripe payment once Stripe reports its PaymentIntent as
+    succeeded. Safe to call repeatedly; returns True if the payment is
+    completed afterwards.
+    """
+    payment = Payment.objects.select_related('api_key').get(pk=payment_id)
+    if payment.status == 'completed':
+        return True
+    
+    # The browser only says the card was confirmed; Stripe is the authority
+    intent = get_stripe_client().payment_intents.retrieve(payment.stripe_payment_intent_id)
+    if intent.status != 'succeeded' or intent.amount != payment.amount_minor_units:
+        return False
+    
+    with transaction.atomic():
+        if payment.mark_completed(stripe_charge_id=getattr(intent, 'latest_charge', None)):
+            apply_upgrade(payment, f'Your card payment of ${payment.amount} has been processed successfully.')
+    return True
+
+
+def upgrade_page_etag(request, key_id):
+    """ETag for the upgrade page: changes with the key's name/tier or the user's CSRF token"""
+    # Only a plain GET can be answered with a 304, and not while flash
+    # messages are queued: the cached copy would not show them
+    if request.method != 'GET' or len(messages.get_messages(request)):
+        return None
+    key = APIKey.objects.filter(id=key_id, user=request.user).values_list('name', 'tier').first()
+    if key is None:
+        return None
+    state = (request.user.pk, *key, request.META.get('CSRF_COOKIE'))
+    return hashlib.sha256(repr(state).encode()).hexdigest()
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@etag(upgrade_page_etag)
 def upgrade_api_key(request, key_id):
     """Upgrade API key to a paid tier"""
-    from django.conf import settings
-    
-    api_key = get_object_or_404(APIKey, id=key_id, user=request.user)
+    api_key = get_object_or_404(APIKey.objects.only(*UPGRADE_KEY_FIELDS), id=key_id, user=request.user)
     
     if request.method == 'POST':
         tier = request.POST.get('tier')
         
-        if tier not in ['basic', 'premium']:
+        if tier not in APIKey.PAID_TIERS:
             messages.error(request, 'Invalid tier selected.')
             return redirect('my_api_keys')
         
         # Get tier price
-        price = APIKey.TIER_PRICES.get(tier, 0)
+        price = APIKey.TIER_PRICES[tier]
+        
+        if PAYMENT_TEST_MODE:
+            # Nothing is charged in test mode, so record the payment as
+            # completed and apply the upgrade in one commit, skipping the
+            # payment page round trip
+            with transaction.atomic():
+                payment = Payment.objects.create(
+                    user=request.user,
+                    api_key=api_key,
+                    amount=price,
+                    payment_type='upgrade',
+                    tier=tier,
+                    description=f'Upgrade to {tier.title()} Tier',
+                    status='completed',
+                    payment_gateway='test',
+                    completed_at=timezone.now()
+                )
+                apply_upgrade(payment, f'Your payment of ${payment.amount} has been processed successfully.')
+            
+            messages.success(request, f'Successfully upgraded to {tier.title()} tier! Your subscription is now active.')
+            return redirect('payment_success', payment_id=payment.id)
         
-        # Create payment record with tier in description
+        # Create payment record
         payment = Payment.objects.create(
             user=request.user,
             api_key=api_key,
             amount=price,
             payment_type='upgrade',
-            description=f'Upgrade to {tier.title()} Tier|{tier}',  # Store tier for later
+            tier=tier,
+            description=f'Upgrade to {tier.title()} Tier',
             status='pending'
         )
         
@@ -651,12 +862,7 @@ def upgrade_api_key(request, key_id):
 @login_required
 def process_payment(request, payment_id):
     """Process payment using Stripe, Razorpay, or Test Mode"""
-    import stripe
-    import razorpay
-    from django.conf import settings
-    from datetime import datetime, timedelta
-    
-    payment = get_object_or_404(Payment, id=payment_id, user=request.user)
+    payment = get_object_or_404(Payment.objects.select_related('api_key'), id=payment_id, user=request.user)
     
     if payment.status == 'completed':
         messages.info(request, 'This payment has already been completed.')
@@ -665,51 +871,32 @@ def process_payment(request, payment_id):
     if request.method == 'POST':
         payment_method = request.POST.get('payment_method', 'test')
         
-        # Check if test mode is enabled in settings
-        use_test_mode = getattr(settings, 'PAYMENT_TEST_MODE', True)
-        
-        if payment_method == 'test' or use_test_mode:
-            # Test mode - simulate successful payment
-            payment.status = 'completed'
-            payment.payment_gateway = 'test'
-            payment.completed_at = datetime.now()
-            payment.save()
+        if payment_method == 'test' or PAYMENT_TEST_MODE:
+            # Test mode - simulate successful payment. Only the request that
+            # completes the payment applies the upgrade, so a double submit
+            # cannot grant it twice. Both writes share one commit; the
+            # notification is written in the background after it.
+            with transaction.atomic():
+                if not payment.mark_completed(payment_gateway='test'):
+                    messages.info(request, 'This payment has already been completed.')
+                    return redirect('my_api_keys')
+                
+                apply_upgrade(payment, f'Your payment of ${payment.amount} has been processed successfully.')
             
-            # Update API key
             if payment.api_key:
-                # Extract tier from payment description
-                tier = 'basic'
-                if '|' in payment.description:
-                    tier = payment.description.split('|')[1]
-                
-                payment.api_key.tier = tier
-                payment.api_key.daily_limit = APIKey.TIER_LIMITS[tier]
-                payment.api_key.subscription_status = 'active'
-                payment.api_key.subscription_start = datetime.now()
-                payment.api_key.subscription_end = datetime.now() + timedelta(days=30)
-                payment.api_key.requests_today = 0  # Reset requests on upgrade
-                payment.api_key.save()
-                
+                tier = payment.tier or 'basic'
                 messages.success(request, f'Successfully upgraded to {tier.title()} tier! Your subscription is now active.')
             
-            # Create notification
-            Notification.objects.create(
-                user=request.user,
-                title='Payment Successful',
-                message=f'Your payment of ${payment.amount} has been processed successfully.',
-                notification_type='billing'
-            )
-            
             return redirect('payment_success', payment_id=payment.id)
         
         # Razorpay payment processing
         elif payment_method == 'razorpay':
             try:
-                client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+                client = get_razorpay_client()
                 
                 # Create Razorpay order
                 order_data = {
-                    'amount': int(payment.amount * 100),  # Convert to paise (100 paise = 1 INR)
+                    'amount': payment.amount_minor_units,  # paise (100 paise = 1 INR)
                     'currency': 'INR',
                     'receipt': f'payment_{payment.id}',
                     'notes': {
@@ -723,13 +910,13 @@ def process_payment(request, payment_id):
                 
                 payment.razorpay_order_id = order['id']
                 payment.payment_gateway = 'razorpay'
-                payment.save()
+                payment.save(update_fields=['razorpay_order_id', 'payment_gateway'])
                 
                 # Return order details to frontend for Razorpay checkout
                 context = {
                     'payment': payment,
                     'razorpay_order_id': order['id'],
-                    'razorpay_key_id': settings.RAZORPAY_KEY_ID,
+                    'razorpay_key_id': RAZORPAY_KEY_ID,
                     'amount': payment.amount,
                     'user_email': request.user.email,
                     'user_name': request.user.get_full_name() or request.user.username,
@@ -740,50 +927,68 @@ def process_payment(request, payment_id):
                 messages.error(request, f'Razorpay payment error: {str(e)}')
                 return redirect('my_api_keys')
         
-        # Stripe payment processing
-        elif payment_method == 'stripe':
-            try:
-                stripe.api_key = settings.STRIPE_SECRET_KEY
-                
-                # Create Stripe payment intent
-                intent = stripe.PaymentIntent.create(
-                    amount=int(payment.amount * 100),  # Convert to cents
-                    currency='usd',
-                    description=payment.description,
-                    metadata={'payment_id': payment.id}
-                )
-                
-                payment.stripe_payment_intent_id = intent.id
-                payment.payment_gateway = 'stripe'
-                payment.save()
-                
-                context = {
-                    'payment': payment,
-                    'client_secret': intent.client_secret,
-                    'stripe_public_key': settings.STRIPE_PUBLIC_KEY,
-                }
-                return render(request, 'stripe_payment.html', context)
-                
-            except Exception as e:
-                messages.error(request, f'Stripe payment error: {str(e)}')
-                return redirect('my_api_keys')
-    
     # GET request - show payment form
-    use_test_mode = getattr(settings, 'PAYMENT_TEST_MODE', True)
-    gateway_preference = getattr(settings, 'PAYMENT_GATEWAY_PREFERENCE', 'auto')
-    
     context = {
         'payment': payment,
-        'test_mode': use_test_mode,
-        'gateway_preference': gateway_preference,
-        'razorpay_key_id': settings.RAZORPAY_KEY_ID if hasattr(settings, 'RAZORPAY_KEY_ID') else None,
+        'test_mode': PAYMENT_TEST_MODE,
+        'gateway_preference': PAYMENT_GATEWAY_PREFERENCE,
+        'razorpay_key_id': RAZORPAY_KEY_ID,
+        'stripe_public_key': settings.STRIPE_PUBLIC_KEY,
     }
     return render(request, 'process_payment.html', context)
 
+
+@login_required
+def stripe_payment_intent(request, payment_id):
+    """Create (or fetch) the Stripe PaymentIntent for a payment and return its client secret"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    payment = get_object_or_404(Payment, id=payment_id, user=request.user)
+    if payment.status == 'completed':
+        return JsonResponse({'error': 'This payment has already been completed.'}, status=409)
+    
+    try:
+        # Keyed on the payment, so a resubmitted or retried POST gets
+        # back the same PaymentIntent instead of opening a second one
+        intent = get_stripe_client().payment_intents.create(
+            params={
+                'amount': payment.amount_minor_units,  # cents
+                'currency': 'usd',
+                'description': payment.description,
+                'metadata': {'payment_id': payment.id},
+            },
+            options={'idempotency_key': f'payment-intent-{payment.id}'}
+        )
+    except Exception as e:
+        return JsonResponse({'error': f'Stripe payment error: {str(e)}'}, status=502)
+    
+    payment.stripe_payment_intent_id = intent.id
+    payment.payment_gateway = 'stripe'
+    payment.save(update_fields=['stripe_payment_intent_id', 'payment_gateway'])
+    
+    return JsonResponse({
+        'client_secret': intent.client_secret,
+        'publishable_key': settings.STRIPE_PUBLIC_KEY,
+    })
+
 @login_required
 def payment_success(request, payment_id):
     """Payment success page"""
-    payment = get_object_or_404(Payment, id=payment_id, user=request.user)
+    receipts = Payment.objects.select_related('api_key').only(*PAYMENT_RECEIPT_FIELDS)
+    payment = get_object_or_404(receipts, id=payment_id, user=request.user)
+    
+    # Stripe.js sends the customer here after confirming the card, so this
+    # is where a Stripe payment is checked and the upgrade applied
+    if (payment.status == 'pending' and payment.payment_gateway == 'stripe'
+            and payment.stripe_payment_intent_id):
+        try:
+            if complete_stripe_payment(payment.id):
+                payment = receipts.get(id=payment.id)
+            else:
+                messages.warning(request, 'Your card payment has not been confirmed by Stripe yet. Refresh this page in a moment.')
+        except Exception as e:
+            messages.error(request, f'Could not verify your Stripe payment: {str(e)}')
     
     context = {
         'payment': payment,
@@ -794,11 +999,6 @@ def payment_success(request, payment_id):
 @login_required
 def razorpay_payment_callback(request):
     """Handle Razorpay payment callback"""
-    import razorpay
-    from django.conf import settings
-    from datetime import datetime, timedelta
-    from django.http import JsonResponse
-    
     if request.method == 'POST':
         try:
             # Get payment details from POST
@@ -806,8 +1006,7 @@ def razorpay_payment_callback(request):
             razorpay_order_id = request.POST.get('razorpay_order_id')
             razorpay_signature = request.POST.get('razorpay_signature')
             
-            # Initialize Razorpay client
-            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+            client = get_razorpay_client()
             
             # Verify payment signature
             params_dict = {
@@ -820,35 +1019,18 @@ def razorpay_payment_callback(request):
                 client.utility.verify_payment_signature(params_dict)
                 
                 # Signature verified - update payment record
-                payment = Payment.objects.get(razorpay_order_id=razorpay_order_id, user=request.user)
-                payment.status = 'completed'
-                payment.razorpay_payment_id = razorpay_payment_id
-                payment.razorpay_signature = razorpay_signature
-                payment.completed_at = datetime.now()
-                payment.save()
-                
-                # Update API key
-                if payment.api_key:
-                    # Extract tier from payment description
-                    tier = 'basic'
-                    if '|' in payment.description:
-                        tier = payment.description.split('|')[1]
-                    
-                    payment.api_key.tier = tier
-                    payment.api_key.daily_limit = APIKey.TIER_LIMITS[tier]
-                    payment.api_key.subscription_status = 'active'
-                    payment.api_key.subscription_start = datetime.now()
-                    payment.api_key.subscription_end = datetime.now() + timedelta(days=30)
-                    payment.api_key.requests_today = 0
-                    payment.api_key.save()
-                
-                # Create notification
-                Notification.objects.create(
-                    user=request.user,
-                    title='Payment Successful',
-                    message=f'Your Razorpay payment of ₹{payment.amount} has been processed successfully.',
-                    notification_type='billing'
+                payment = Payment.objects.select_related('api_key').get(
+                    razorpay_order_id=razorpay_order_id, user=request.user
                 )
+                with transaction.atomic():
+                    if not payment.mark_completed(
+                        razorpay_payment_id=razorpay_payment_id,
+                        razorpay_signature=razorpay_signature
+                    ):
+                        # A replayed callback: the upgrade was already applied
+                        return redirect('payment_success', payment_id=payment.id)
+                    
+                    apply_upgrade(payment, f'Your Razorpay payment of ₹{payment.amount} has been processed successfully.')
                 
                 messages.success(request, 'Payment successful! Your subscription is now active.')
                 return redirect('payment_success', payment_id=payment.id)
@@ -880,19 +1062,20 @@ def cancel_subscription(request, key_id):
     api_key = get_object_or_404(APIKey, id=key_id, user=request.user)
     
     if request.method == 'POST':
-        # Downgrade to free tier
-        api_key.tier = 'free'
-        api_key.daily_limit = 50
-        api_key.subscription_status = 'cancelled'
-        api_key.save()
-        
-        # Create notification
-        Notification.objects.create(
-            user=request.user,
-            title='Subscription Cancelled',
-            message=f'Your subscription for "{api_key.name}" has been cancelled. You are now on the free tier.',
-            notification_type='billing'
-        )
+        with transaction.atomic():
+            # Downgrade to free tier
+            api_key.tier = 'free'
+            api_key.subscription_status = 'cancelled'
+            api_key.save(update_fields=['tier', 'subscription_status'])
+            # The API must stop granting the paid limit right away
+            api_key.clear_cached_lookup()
+
+            Notification.objects.create(
+                user=request.user,
+                title='Subscription Cancelled',
+                message=f'Your subscription for "{api_key.name}" has been cancelled. You are now on the free tier.',
+                notification_type='billing'
+            )
         
         messages.success(request, f'Subscription cancelled for "{api_key.name}". Downgraded to free tier.')
     